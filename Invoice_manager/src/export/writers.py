@@ -5,14 +5,17 @@ This module provides exporters for saving extracted invoice data in different fo
 """
 
 import csv
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from src.utils import jsonio
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -59,8 +62,7 @@ class JSONWriter(BaseWriter):
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Write data to JSON file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        output_path.write_bytes(jsonio.dumps_bytes(data, indent=True))
         
         logger.info(f"Exported invoice data to JSON: {output_path}")
         return str(output_path)
@@ -69,6 +71,9 @@ class JSONWriter(BaseWriter):
 class CSVWriter(BaseWriter):
     """Writer for CSV format output."""
     
+    # Header layouts shared by all instances, keyed by invoice schema
+    _schema_cache: Dict[Tuple, Tuple[List[str], Dict[str, int]]] = {}
+    
     def write(self, data: Union[Dict, List[Dict]], output_path: Optional[str] = None) -> str:
         """
         Write invoice data to CSV file.
@@ -95,71 +100,94 @@ class CSVWriter(BaseWriter):
         else:
             data_list = data
         
-        # Flatten the first invoice to get all field names
-        flattened_fields = self._get_flattened_fields(data_list[0])
+        # Build the header once per schema and reuse it across calls
+        flattened_fields, index = self._get_flattened_fields(data_list)
         
         # Write data to CSV file
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=flattened_fields)
-            writer.writeheader()
-            
-            for invoice in data_list:
-                # Flatten each invoice record
-                flat_invoice = self._flatten_invoice(invoice)
-                writer.writerow(flat_invoice)
+            writer = csv.writer(f)
+            writer.writerow(flattened_fields)
+            writer.writerows(self._iter_rows(data_list, index))
         
         logger.info(f"Exported invoice data to CSV: {output_path}")
         return str(output_path)
     
-    def _get_flattened_fields(self, invoice: Dict) -> List[str]:
+    def _get_flattened_fields(self, data_list: List[Dict]) -> Tuple[List[str], Dict[str, int]]:
         """
-        Get flattened field names from invoice data.
+        Get flattened field names and their column indexes for a batch.
+        
+        Top-level fields are taken from the first invoice. Line item columns
+        are generated up to the largest number of line items in the batch,
+        so invoices with more items than the first one keep all their values.
+        The result is cached per schema, so repeated exports of the same shape
+        skip header construction.
         
         Args:
-            invoice: Invoice data
+            data_list: List of invoice data
             
         Returns:
-            List of flattened field names
+            Tuple of (flattened field names, column index by field name)
         """
-        fields = []
+        top_fields = tuple(field for field in data_list[0] if field not in ("line_items", "metadata"))
+        
+        # One pass over the batch for the line item count and item field names
+        max_items = 0
+        item_fields: Dict[str, None] = {}
+        for invoice in data_list:
+            items = invoice.get("line_items") or []
+            if len(items) > max_items:
+                max_items = len(items)
+            if not item_fields and items:
+                item_fields = dict.fromkeys(items[0])
         
-        # Add all top-level fields except line_items and metadata
-        for field in invoice:
-            if field not in ["line_items", "metadata"]:
-                fields.append(field)
+        key = (top_fields, tuple(item_fields), max_items)
+        cached = self._schema_cache.get(key)
+        if cached is not None:
+            return cached
         
-        # Add line_item field prefixes if present
-        if "line_items" in invoice and invoice["line_items"]:
-            item = invoice["line_items"][0]
-            for item_field in item:
-                fields.append(f"line_item_1_{item_field}")
+        fields = list(top_fields)
+        for n in range(1, max_items + 1):
+            for item_field in item_fields:
+                fields.append(f"line_item_{n}_{item_field}")
         
-        return fields
+        schema = (fields, {field: i for i, field in enumerate(fields)})
+        self._schema_cache[key] = schema
+        return schema
     
-    def _flatten_invoice(self, invoice: Dict) -> Dict:
+    def _iter_rows(self, data_list: List[Dict], index: Dict[str, int]) -> Iterator[List[Any]]:
         """
-        Flatten invoice data for CSV output.
+        Yield positional CSV rows for each invoice.
+        
+        Values are placed directly by column index, so no intermediate
+        flattened dictionary is built per invoice. Fields that are not in
+        the header are skipped.
         
         Args:
-            invoice: Invoice data
+            data_list: List of invoice data
+            index: Column index by flattened field name
             
-        Returns:
-            Flattened invoice data
+        Yields:
+            List of cell values for each invoice
         """
-        flattened = {}
+        width = len(index)
         
-        # Copy all top-level fields except line_items and metadata
-        for field, value in invoice.items():
-            if field not in ["line_items", "metadata"]:
-                flattened[field] = value
-        
-        # Add line_items as flattened fields
-        if "line_items" in invoice and invoice["line_items"]:
-            for i, item in enumerate(invoice["line_items"], start=1):
+        for invoice in data_list:
+            row = [''] * width
+            
+            # Top-level fields (line_items and metadata are never in the header)
+            for field, value in invoice.items():
+                i = index.get(field)
+                if i is not None:
+                    row[i] = value
+            
+            # Line item fields
+            for n, item in enumerate(invoice.get("line_items") or [], start=1):
                 for item_field, item_value in item.items():
-                    flattened[f"line_item_{i}_{item_field}"] = item_value
-        
-        return flattened
+                    i = index.get(f"line_item_{n}_{item_field}")
+                    if i is not None:
+                        row[i] = item_value
+            
+            yield row
 
 
 class WebhookWriter(BaseWriter):
@@ -177,6 +205,22 @@ class WebhookWriter(BaseWriter):
         self.enabled = self.webhook_config["enabled"]
         self.url = self.webhook_config["url"]
         self.headers = self.webhook_config["headers"]
+        # (connect, read) timeout in seconds so a stalled endpoint cannot hang the export
+        self.timeout = (3, 30)
+        # Lists longer than batch_size are split and posted concurrently (0 disables)
+        self.batch_size = self.webhook_config.get("batch_size", 0)
+        self.max_concurrency = self.webhook_config.get("max_concurrency", 4)
+        
+        # Reuse one session so repeated exports keep the connection alive
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=max(10, self.max_concurrency),
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
     
     def write(self, data: Union[Dict, List[Dict]], output_path: Optional[str] = None) -> str:
         """
@@ -199,22 +243,63 @@ class WebhookWriter(BaseWriter):
             logger.error("Webhook URL not configured")
             return "Webhook URL not configured"
         
+        # Split large lists into batches that are posted concurrently
+        if self.batch_size and isinstance(data, list) and len(data) > self.batch_size:
+            return self._write_batches(data)
+        
+        return self._post(data)[1]
+    
+    def _write_batches(self, data: List[Dict]) -> str:
+        """
+        Send a list of invoices to the webhook in concurrent batches.
+        
+        Args:
+            data: List of invoice data
+            
+        Returns:
+            Confirmation message for the webhook requests
+        """
+        batches = [data[i:i + self.batch_size] for i in range(0, len(data), self.batch_size)]
+        workers = min(self.max_concurrency, len(batches))
+        
+        # The pooled session is shared, so each worker reuses a kept-alive connection
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(self._post, batches))
+        
+        failed = sum(1 for ok, _ in outcomes if not ok)
+        if failed:
+            logger.error(f"Webhook batch requests failed: {failed}/{len(batches)} batches")
+            return f"Webhook requests failed: {failed}/{len(batches)} batches"
+        
+        logger.info(f"Webhook batch requests successful: {len(batches)} batches")
+        return f"Webhook requests successful: {len(batches)} batches"
+    
+    def _post(self, payload: Union[Dict, List[Dict]]) -> Tuple[bool, str]:
+        """
+        Send a single payload to the webhook.
+        
+        Args:
+            payload: Invoice data to send
+            
+        Returns:
+            Tuple of (success flag, confirmation message)
+        """
         try:
             # Send data to webhook
-            response = requests.post(
+            response = self._session.post(
                 self.url,
-                json=data,
-                headers=self.headers
+                json=payload,
+                timeout=self.timeout
             )
             
             # Log response
             if response.ok:
                 logger.info(f"Webhook request successful: {response.status_code}")
-                return f"Webhook request successful: {response.status_code}"
+                return True, f"Webhook request successful: {response.status_code}"
             else:
                 logger.error(f"Webhook request failed: {response.status_code} - {response.text}")
-                return f"Webhook request failed: {response.status_code}"
+                return False, f"Webhook request failed: {response.status_code}"
                 
         except Exception as e:
             logger.error(f"Webhook request error: {str(e)}")
-            return f"Webhook request error: {str(e)}" 
\ No newline at end of file
+            return False, f"Webhook request error: {str(e)}"
@@ -4,14 +4,75 @@ Field Locator
 This module extracts invoice fields from OCR text using regex patterns and heuristics.
 """
 
+import copy
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple
 
 from src.utils.logger import setup_logger
 
+try:
+    import hyperscan
+except ImportError:  # Optional accelerator, fall back to the re module
+    hyperscan = None
+
 logger = setup_logger(__name__)
 
+# Hyperscan databases shared between FieldLocator instances, keyed by patterns
+_HS_DB_CACHE: Dict[Tuple, Tuple[Optional[Any], List[Tuple[str, int]]]] = {}
+
+# Extraction results for recently seen texts, keyed by a digest of the text.
+# Retries and duplicate uploads then skip the pattern scan entirely.
+_EXTRACT_CACHE: "OrderedDict[bytes, Dict]" = OrderedDict()
+_EXTRACT_CACHE_SIZE = 1024
+_EXTRACT_CACHE_LOCK = threading.Lock()
+
+# Precompiled pattern for text normalization: a separator with its surrounding
+# whitespace, or any other whitespace run (which also covers line endings)
+_NORMALIZE_RE = re.compile(r'\s*([:\-])\s*|\s+')
+
+
+def _normalize_match(match: re.Match) -> str:
+    """Replacement for _NORMALIZE_RE: pad separators, collapse whitespace."""
+    separator = match.group(1)
+    return f" {separator} " if separator else " "
+
+
+# Thousand separators dropped when converting Spanish amounts to numbers
+_AMOUNT_TRANS = str.maketrans({'.': '', ' ': '', '\xa0': '', '€': ''})
+
+# Fields whose values are amounts and also get a numeric form in metadata
+_AMOUNT_FIELDS = ("total_eur", "vat_amount")
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """
+    Convert a Spanish formatted amount such as "1.234,56 €" to a float.
+    
+    Args:
+        value: Amount text with optional thousand separators and € sign
+        
+    Returns:
+        Parsed amount, or None if the text is not a number
+    """
+    try:
+        return float(value.translate(_AMOUNT_TRANS).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+# Precompiled patterns for line item extraction
+_TABLE_RE = re.compile(
+    r'(?:descripción|concepto|artículo|producto|servicio)(?:[^\n]+)(?:cantidad|cant|qty|ud)(?:[^\n]+)(?:precio|importe|p\.u\.)(?:[^\n]+)(?:total)(?:[^\n]+\n)((?:.*\n)+)',
+    re.IGNORECASE
+)
+_LINE_ITEM_RE = re.compile(
+    r'([^\n]+?)(?:\s+)(\d+(?:,\d+)?)(?:\s+)(\d{1,3}(?:[\s\.]?\d{3})*(?:,\d{1,2})?)(?:\s*€)?(?:\s+)(\d{1,3}(?:[\s\.]?\d{3})*(?:,\d{1,2})?)(?:\s*€)?'
+)
+
 
 class FieldLocator:
     """Extracts invoice field data using regex patterns and heuristics."""
@@ -26,7 +87,7 @@ class FieldLocator:
         self.config = config
         
         # Regex patterns for Spanish invoices
-        self._patterns = {
+        patterns = {
             # Invoice number - common patterns like "Factura Nº: 12345" or "Nº de factura: 12345"
             "invoice_number": [
                 r"(?:factura|fact|fra)(?:\s+)(?:n[º|°|o]?\.?:?\s*)([A-Za-z0-9\-\/]+)",
@@ -93,6 +154,15 @@ class FieldLocator:
             ]
         }
         
+        # Compile every pattern once so extraction does not re-parse them per call
+        self._patterns = {
+            field: [re.compile(p, re.IGNORECASE) for p in field_patterns]
+            for field, field_patterns in patterns.items()
+        }
+        
+        # Multi-pattern database used to scan the text once for all fields
+        self._hs_db, self._hs_ids = self._build_hyperscan_db(patterns)
+        
         logger.info("Initialized field locator with heuristic patterns")
     
     def extract_fields(self, text: str) -> Dict:
@@ -107,14 +177,51 @@ class FieldLocator:
         """
         logger.debug("Extracting fields from OCR text")
         
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with _EXTRACT_CACHE_LOCK:
+            cached = _EXTRACT_CACHE.get(key)
+            if cached is not None:
+                _EXTRACT_CACHE.move_to_end(key)
+        if cached is not None:
+            results = copy.deepcopy(cached)
+            results["metadata"]["extraction_timestamp"] = datetime.now().isoformat()
+            logger.info(f"Reused {len(results) - 1} invoice fields from extraction cache")
+            return results
+        
+        results = self._extract_fields_uncached(text)
+        
+        cached = copy.deepcopy(results)
+        with _EXTRACT_CACHE_LOCK:
+            _EXTRACT_CACHE[key] = cached
+            if len(_EXTRACT_CACHE) > _EXTRACT_CACHE_SIZE:
+                _EXTRACT_CACHE.popitem(last=False)
+        
+        return results
+    
+    def _extract_fields_uncached(self, text: str) -> Dict:
+        """
+        Extract invoice fields from OCR text without consulting the cache.
+        
+        Args:
+            text: OCR extracted text
+            
+        Returns:
+            Dictionary of extracted field values
+        """
         # Normalize text: trim spaces, normalize line endings
         normalized_text = self._normalize_text(text)
         
         results = {}
         
+        # Find candidate match positions for all patterns in a single pass
+        candidates = self._scan_candidates(normalized_text)
+        
         # Extract fields using regex patterns
         for field, patterns in self._patterns.items():
-            value = self._extract_with_patterns(normalized_text, patterns)
+            if candidates is None:
+                value = self._extract_with_patterns(normalized_text, patterns)
+            else:
+                value = self._extract_with_candidates(normalized_text, patterns, candidates.get(field, {}))
             if value:
                 results[field] = value
                 logger.debug(f"Extracted {field}: {value}")
@@ -131,6 +238,16 @@ class FieldLocator:
             "extraction_timestamp": datetime.now().isoformat()
         }
         
+        # Numeric amounts so downstream consumers do not re-parse the strings
+        amounts = {}
+        for field in _AMOUNT_FIELDS:
+            if field in results:
+                amount = parse_amount(results[field])
+                if amount is not None:
+                    amounts[field] = amount
+        if amounts:
+            results["metadata"]["amounts"] = amounts
+        
         logger.info(f"Extracted {len(results) - 1} invoice fields")  # -1 for metadata
         return results
     
@@ -144,34 +261,106 @@ class FieldLocator:
         Returns:
             Normalized text
         """
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Normalize line endings
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        
-        # Normalize spaces around common separators
-        text = re.sub(r'\s*([:\-])\s*', r' \1 ', text)
-        
-        return text.strip()
+        # Collapse whitespace (including line endings) and normalize spaces
+        # around common separators in a single pass
+        return _NORMALIZE_RE.sub(_normalize_match, text).strip()
     
-    def _extract_with_patterns(self, text: str, patterns: List[str]) -> Optional[str]:
+    def _extract_with_patterns(self, text: str, patterns: List[Pattern]) -> Optional[str]:
         """
-        Extract field using a list of regex patterns.
+        Extract field using a list of compiled regex patterns.
         
         Args:
             text: OCR text to search
-            patterns: List of regex patterns to try
+            patterns: List of compiled regex patterns to try
             
         Returns:
             Extracted value or None if not found
         """
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match and match.group(1):
                 return match.group(1).strip()
         return None
     
+    def _extract_with_candidates(self, text: str, patterns: List[Pattern], matched: Set[int]) -> Optional[str]:
+        """
+        Extract field using only the patterns that the multi-pattern scan matched.
+        
+        Args:
+            text: OCR text to search
+            patterns: List of compiled regex patterns to try
+            matched: Indexes of the patterns that matched somewhere in the text
+            
+        Returns:
+            Extracted value or None if not found
+        """
+        for i, pattern in enumerate(patterns):
+            if i not in matched:
+                continue
+            match = pattern.search(text)
+            if match and match.group(1):
+                return match.group(1).strip()
+        return None
+    
+    def _build_hyperscan_db(self, patterns: Dict[str, List[str]]) -> Tuple[Optional[Any], List[Tuple[str, int]]]:
+        """
+        Compile all field patterns into a single Hyperscan database.
+        
+        The database only depends on the patterns, so it is compiled once per
+        process and shared between FieldLocator instances.
+        
+        Args:
+            patterns: Mapping of field names to regex pattern strings
+            
+        Returns:
+            Tuple of (database, list of (field, pattern index) per id), or (None, []) if unavailable
+        """
+        if hyperscan is None:
+            return None, []
+        
+        key = tuple((field, tuple(field_patterns)) for field, field_patterns in patterns.items())
+        if key in _HS_DB_CACHE:
+            return _HS_DB_CACHE[key]
+        
+        ids = [(field, i) for field, field_patterns in patterns.items() for i in range(len(field_patterns))]
+        expressions = [patterns[field][i].encode("utf-8") for field, i in ids]
+        # Only whether a pattern matches is needed, so report each pattern once
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        
+        try:
+            db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            db.compile(expressions=expressions, ids=list(range(len(ids))), flags=[flags] * len(ids))
+        except Exception as e:
+            logger.warning(f"Could not compile Hyperscan database, using re fallback: {str(e)}")
+            db, ids = None, []
+        else:
+            logger.debug(f"Compiled {len(ids)} patterns into Hyperscan database")
+        
+        _HS_DB_CACHE[key] = (db, ids)
+        return db, ids
+    
+    def _scan_candidates(self, text: str) -> Optional[Dict[str, Set[int]]]:
+        """
+        Scan the text once with Hyperscan and record which patterns match.
+        
+        Args:
+            text: Normalized OCR text
+            
+        Returns:
+            Mapping of field name to the indexes of its matching patterns, or None if Hyperscan is unavailable
+        """
+        if self._hs_db is None:
+            return None
+        
+        candidates = {}
+        
+        def on_match(pattern_id, start, end, flags, context):
+            field, index = self._hs_ids[pattern_id]
+            candidates.setdefault(field, set()).add(index)
+        
+        self._hs_db.scan(text.encode("utf-8"), match_event_handler=on_match)
+        return candidates
+    
     def _extract_line_items(self, text: str) -> Optional[List[Dict]]:
         """
         Extract line items from invoice text.
@@ -186,8 +375,7 @@ class FieldLocator:
         # and would need to handle different invoice table formats
         
         # Look for potential table sections in the invoice
-        table_pattern = r'(?:descripción|concepto|artículo|producto|servicio)(?:[^\n]+)(?:cantidad|cant|qty|ud)(?:[^\n]+)(?:precio|importe|p\.u\.)(?:[^\n]+)(?:total)(?:[^\n]+\n)((?:.*\n)+)'
-        table_match = re.search(table_pattern, text, re.IGNORECASE)
+        table_match = _TABLE_RE.search(text)
         
         if not table_match:
             return None
@@ -196,16 +384,17 @@ class FieldLocator:
         
         # Simple pattern for line items - this is a basic approach
         # More sophisticated parsing would be needed for real invoices
-        item_pattern = r'([^\n]+?)(?:\s+)(\d+(?:,\d+)?)(?:\s+)(\d{1,3}(?:[\s\.]?\d{3})*(?:,\d{1,2})?)(?:\s*€)?(?:\s+)(\d{1,3}(?:[\s\.]?\d{3})*(?:,\d{1,2})?)(?:\s*€)?'
         items = []
         
-        for match in re.finditer(item_pattern, table_text):
-            if match and len(match.groups()) >= 4:
-                items.append({
-                    'description': match.group(1).strip(),
-                    'qty': match.group(2).strip(),
-                    'unit_price': match.group(3).strip(),
-                    'line_total': match.group(4).strip()
-                })
+        # Items stay plain dicts: the schema validator, the refiner prompt and
+        # the JSON/CSV writers all consume line items as JSON objects
+        for match in _LINE_ITEM_RE.finditer(table_text):
+            description, qty, unit_price, line_total = match.group(1, 2, 3, 4)
+            items.append({
+                'description': description.strip(),
+                'qty': qty.strip(),
+                'unit_price': unit_price.strip(),
+                'line_total': line_total.strip()
+            })
         
         return items if items else None 
\ No newline at end of file
@@ -4,20 +4,49 @@ OpenAI Refiner
 This module refines extracted invoice fields using OpenAI's GPT-4o model.
 """
 
+import asyncio
+import atexit
 import json
 import os
+import threading
 import time
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, TextIO, Tuple, Union
 
+import httpx
 import openai
 from jinja2 import Environment, FileSystemLoader
 
+try:
+    import ijson
+except ImportError:  # Optional, fall back to loading the whole examples file
+    ijson = None
+
+try:
+    import tiktoken
+except ImportError:  # Optional, fall back to estimating tokens from characters
+    tiktoken = None
+
+from src.utils import jsonio
+from src.utils.llm_cache import SqliteCache, make_key
+from src.utils.rate_limiter import RateLimiter
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Errors worth retrying while polling a batch job: connection problems,
+# rate limits and transient server errors
+_TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# Appended to the system message when several invoices share one request
+_GROUP_INSTRUCTIONS = (
+    "You will receive several invoices in one message, each introduced by a line "
+    "'--- Invoice #N ---'. Extract each invoice independently and return a JSON object "
+    "of the form {\"results\": [...]} with exactly one object per invoice, in the same order."
+)
+
 
 class OpenAIRefiner:
     """Refines extracted invoice fields using OpenAI."""
@@ -33,20 +62,61 @@ class OpenAIRefiner:
         self.model = config["openai"]["model"]
         self.temperature = config["openai"]["temperature"]
         self.max_tokens = config["openai"]["max_tokens"]
+        # Completion limit of the model; grouped requests never ask for more
+        self.max_output_tokens = config["openai"].get("max_output_tokens", 16384)
         self.few_shot_examples = config["openai"]["few_shot_examples"]
         self.log_prompts = config["openai"]["log_prompts"]
+        self.batch_poll_interval = config["openai"].get("batch_poll_interval", 30)
+        self.batch_poll_retries = config["openai"].get("batch_poll_retries", 5)
         self.last_timestamp = None
         
+        # Prompt log handle, opened on first use and kept open between invoices
+        self._prompt_log = None
+        self._prompt_log_lock = threading.Lock()
+        
         # Set up Jinja2 for prompt templates
         templates_dir = Path(__file__).parent / "prompts"
-        self.jinja_env = Environment(loader=FileSystemLoader(templates_dir))
+        self.jinja_env = Environment(loader=FileSystemLoader(templates_dir), auto_reload=False, cache_size=400)
+        
+        # The system message only depends on the schema and examples, so render it once
+        schema_path = Path(config["validation"]["schema"])
+        self._schema = jsonio.loads(schema_path.read_bytes())
+        self._system_message = self._render_system_message(self._schema)
         
         # Ensure OpenAI API key is set
         if "OPENAI_API_KEY" not in os.environ:
             logger.warning("OPENAI_API_KEY environment variable not set")
         
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Initialize the OpenAI client. It keeps its connections alive, so only
+        # the first call pays the TLS handshake
+        self._limits = httpx.Limits(
+            max_connections=config["openai"].get("max_connections", 64),
+            max_keepalive_connections=config["openai"].get("max_keepalive_connections", 32)
+        )
+        self._timeout = config["openai"].get("timeout", 60.0)
+        self.client = openai.OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            http_client=httpx.Client(transport=httpx.HTTPTransport(retries=2, limits=self._limits), timeout=self._timeout)
+        )
+        
+        # The async client serves concurrent batch refinement. Its connections
+        # belong to the event loop that opened them, so it is created inside the
+        # running loop (see _get_aclient) and closed by aclose
+        self.aclient = None
+        self._aclient_loop = None
+        
+        # Local throttle that keeps requests under the account's rate limits
+        self.rate_limiter = None
+        max_requests_per_minute = config["openai"].get("max_requests_per_minute")
+        max_tokens_per_minute = config["openai"].get("max_tokens_per_minute")
+        if max_requests_per_minute and max_tokens_per_minute:
+            self.rate_limiter = RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+        self._encoding = self._load_encoding()
+        
+        # Cache of refinement results keyed by prompt (set to None to always call the API)
+        self.cache = None
+        if config["openai"].get("cache_enabled", True):
+            self.cache = SqliteCache(config["openai"].get("cache_dir", ".cache/llm"))
         
         logger.info(f"Initialized OpenAI refiner with model: {self.model}")
     
@@ -63,21 +133,201 @@ class OpenAIRefiner:
         """
         logger.info("Refining extracted fields with OpenAI")
         
-        # Get invoice schema
-        schema_path = Path(self.config["validation"]["schema"])
-        with open(schema_path, 'r') as f:
-            schema = json.load(f)
+        prompt = self._prepare_prompt(ocr_text, initial_fields)
+        
+        # Reuse a cached response for an identical prompt
+        key = self._cache_key(prompt)
+        refined_fields = self._cache_get(key)
+        if refined_fields is None:
+            # Call OpenAI API
+            refined_fields = self._call_openai(prompt)
+            self._cache_set(key, refined_fields)
+        
+        return self._finalize(refined_fields, initial_fields)
+    
+    async def arefine(self, ocr_text: str, initial_fields: Dict) -> Dict:
+        """
+        Refine extracted fields using OpenAI without blocking the event loop.
+        
+        Args:
+            ocr_text: Raw OCR text from the invoice
+            initial_fields: Dictionary of initially extracted fields
+            
+        Returns:
+            Refined dictionary of invoice fields
+        """
+        logger.info("Refining extracted fields with OpenAI (async)")
+        
+        prompt = self._prepare_prompt(ocr_text, initial_fields)
+        
+        # Reuse a cached response for an identical prompt
+        key = self._cache_key(prompt)
+        refined_fields = self._cache_get(key)
+        if refined_fields is None:
+            # Call OpenAI API
+            refined_fields = await self._acall_openai(prompt)
+            self._cache_set(key, refined_fields)
+        
+        return self._finalize(refined_fields, initial_fields)
+    
+    def _cache_key(self, messages: List[Dict]) -> str:
+        """
+        Build the cache key for a prompt.
+        
+        Args:
+            messages: Messages sent to OpenAI
+            
+        Returns:
+            Cache key covering the model, sampling parameters and messages
+        """
+        return make_key(
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            messages=messages
+        )
+    
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached refinement result.
+        
+        Args:
+            key: Cache key for the prompt
+            
+        Returns:
+            Cached refined fields, or None on a miss or when caching is off
+        """
+        if self.cache is None:
+            return None
+        
+        try:
+            result = self.cache.get(key)
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+        
+        if result is not None:
+            logger.info("Using cached OpenAI refinement result")
+        return result
+    
+    def _cache_set(self, key: str, result: Dict) -> None:
+        """
+        Store a refinement result, skipping failed (empty) responses.
+        
+        Args:
+            key: Cache key for the prompt
+            result: Refined fields returned by OpenAI
+        """
+        if self.cache is None or not result:
+            return
+        
+        try:
+            self.cache.set(key, result)
+        except Exception as e:
+            logger.error(f"Error writing LLM cache: {str(e)}")
+    
+    def refine_many(self, inputs: List[Tuple[str, Dict]]) -> List[Dict]:
+        """
+        Refine several invoices with a single OpenAI request.
+        
+        Packing invoices into one prompt uses one request slot for many
+        invoices. Invoices whose prompt is already cached are answered
+        locally. Requests hold at most as many invoices as fit in
+        openai.max_output_tokens at max_tokens each, so larger inputs are
+        split over several requests. If a response does not contain one
+        result per invoice, the affected invoices are refined one by one
+        instead.
         
+        Args:
+            inputs: List of (OCR text, initial fields) per invoice
+            
+        Returns:
+            Refined dictionaries of invoice fields, in input order
+        """
+        group_size = max(1, self.max_output_tokens // self.max_tokens)
+        logger.info(f"Refining {len(inputs)} invoices with up to {group_size} per OpenAI request")
+        
+        prompts = [self._prepare_prompt(ocr_text, initial_fields) for ocr_text, initial_fields in inputs]
+        keys = [self._cache_key(prompt) for prompt in prompts]
+        results = [self._cache_get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        for start in range(0, len(missing), group_size):
+            group = missing[start:start + group_size]
+            if len(group) < 2:
+                continue
+            response = self._call_openai(
+                self._create_group_prompt([prompts[i] for i in group]),
+                max_tokens=min(self.max_tokens * len(group), self.max_output_tokens)
+            )
+            group_results = response.get("results")
+            if isinstance(group_results, list) and len(group_results) == len(group):
+                for i, result in zip(group, group_results):
+                    results[i] = result if isinstance(result, dict) else {}
+                    self._cache_set(keys[i], results[i])
+            else:
+                logger.warning("Grouped OpenAI response did not match the invoices, refining them one by one")
+        
+        for i in missing:
+            if results[i] is None:
+                results[i] = self._call_openai(prompts[i])
+                self._cache_set(keys[i], results[i])
+        
+        return [
+            self._finalize(result, initial_fields)
+            for result, (_, initial_fields) in zip(results, inputs)
+        ]
+    
+    def _create_group_prompt(self, prompts: List[List[Dict]]) -> List[Dict]:
+        """
+        Combine single-invoice prompts into one multi-invoice prompt.
+        
+        Args:
+            prompts: Prompts created by _create_prompt, one per invoice
+            
+        Returns:
+            List of message dictionaries for OpenAI API
+        """
+        user_content = "\n\n".join(
+            f"--- Invoice #{n} ---\n{prompt[1]['content']}" for n, prompt in enumerate(prompts, start=1)
+        )
+        
+        return [
+            {"role": "system", "content": f"{self._system_message}\n\n{_GROUP_INSTRUCTIONS}"},
+            {"role": "user", "content": user_content}
+        ]
+    
+    def _prepare_prompt(self, ocr_text: str, initial_fields: Dict) -> List[Dict]:
+        """
+        Build (and optionally log) the refinement prompt.
+        
+        Args:
+            ocr_text: Raw OCR text from the invoice
+            initial_fields: Dictionary of initially extracted fields
+            
+        Returns:
+            List of message dictionaries for OpenAI API
+        """
         # Create prompt
-        prompt = self._create_prompt(ocr_text, initial_fields, schema)
+        prompt = self._create_prompt(ocr_text, initial_fields)
         
         # Log prompt if enabled
         if self.log_prompts:
             self._log_prompt(prompt, initial_fields)
         
-        # Call OpenAI API
-        refined_fields = self._call_openai(prompt)
+        return prompt
+    
+    def _finalize(self, refined_fields: Dict, initial_fields: Dict) -> Dict:
+        """
+        Add extraction metadata to the refined fields.
         
+        Args:
+            refined_fields: Fields returned by OpenAI
+            initial_fields: Dictionary of initially extracted fields
+            
+        Returns:
+            Refined dictionary of invoice fields with metadata
+        """
         # Record timestamp
         self.last_timestamp = datetime.now().isoformat()
         
@@ -100,17 +350,15 @@ class OpenAIRefiner:
         logger.info(f"OpenAI refinement complete, extracted {len(refined_fields) - 1} fields")  # -1 for metadata
         return refined_fields
     
-    def _create_prompt(self, ocr_text: str, initial_fields: Dict, schema: Dict) -> List[Dict]:
+    def _render_system_message(self, schema: Dict) -> str:
         """
-        Create a prompt for OpenAI to refine extracted fields.
+        Render the system message with the schema and few-shot examples.
         
         Args:
-            ocr_text: Raw OCR text
-            initial_fields: Initially extracted fields
             schema: JSON schema for invoice data
             
         Returns:
-            List of message dictionaries for OpenAI API
+            Rendered system message
         """
         # Load template
         template = self.jinja_env.get_template("invoice_extraction.j2")
@@ -122,55 +370,344 @@ class OpenAIRefiner:
         examples = self._get_few_shot_examples()
         
         # Render system message
-        system_message = template.render(
+        return template.render(
             schema=simplified_schema,
             examples=examples
         )
+    
+    def _create_prompt(self, ocr_text: str, initial_fields: Dict) -> List[Dict]:
+        """
+        Create a prompt for OpenAI to refine extracted fields.
+        
+        Args:
+            ocr_text: Raw OCR text
+            initial_fields: Initially extracted fields
+            
+        Returns:
+            List of message dictionaries for OpenAI API
+        """
+        # Metadata (extraction timestamps etc.) is not useful to the model and
+        # would make every prompt unique, defeating the response cache
+        prompt_fields = {k: v for k, v in initial_fields.items() if k != "metadata"}
         
         # Create messages for OpenAI
         messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": f"OCR Text:\n\n{ocr_text}\n\nInitial fields extracted:\n\n{json.dumps(initial_fields, indent=2, ensure_ascii=False)}"}
+            {"role": "system", "content": self._system_message},
+            {"role": "user", "content": f"OCR Text:\n\n{ocr_text}\n\nInitial fields extracted:\n\n{jsonio.dumps(prompt_fields, indent=True)}"}
         ]
         
         return messages
     
-    def _call_openai(self, messages: List[Dict]) -> Dict:
+    def _call_openai(self, messages: List[Dict], max_tokens: Optional[int] = None) -> Dict:
         """
         Call OpenAI API for invoice field refinement.
         
         Args:
             messages: List of message dictionaries for the API
+            max_tokens: Completion token limit (defaults to the configured limit)
             
         Returns:
             Refined dictionary of invoice fields
         """
         try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self._estimate_tokens(messages, max_tokens or self.max_tokens))
+            
             # Call OpenAI API
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens,
+                max_tokens=max_tokens or self.max_tokens,
                 response_format={"type": "json_object"}
             )
             
-            # Parse response
-            content = response.choices[0].message.content
+            return self._parse_content(response.choices[0].message.content)
+                
+        except openai.RateLimitError as e:
+            logger.error(f"OpenAI rate limit exceeded: {str(e)}")
+            self._cool_down(e)
+            return {}
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API: {str(e)}")
+            # Return initial fields in case of error
+            return {}
+    
+    async def _acall_openai(self, messages: List[Dict]) -> Dict:
+        """
+        Call OpenAI API for invoice field refinement using the async client.
+        
+        Args:
+            messages: List of message dictionaries for the API
+            
+        Returns:
+            Refined dictionary of invoice fields
+        """
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(self._estimate_tokens(messages, self.max_tokens))
             
-            try:
-                result = json.loads(content)
-                return result
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing OpenAI response: {str(e)}")
-                logger.error(f"Response content: {content}")
-                return {}
+            # Call OpenAI API
+            response = await self._get_aclient().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_object"}
+            )
+            
+            return self._parse_content(response.choices[0].message.content)
                 
+        except openai.RateLimitError as e:
+            logger.error(f"OpenAI rate limit exceeded: {str(e)}")
+            self._cool_down(e)
+            return {}
         except Exception as e:
             logger.error(f"Error calling OpenAI API: {str(e)}")
             # Return initial fields in case of error
             return {}
     
+    def _get_aclient(self) -> "openai.AsyncOpenAI":
+        """
+        Get the async OpenAI client of the running event loop.
+        
+        Returns:
+            Async OpenAI client bound to the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self.aclient is None or self._aclient_loop is not loop:
+            self.aclient = openai.AsyncOpenAI(
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                http_client=httpx.AsyncClient(
+                    transport=httpx.AsyncHTTPTransport(retries=2, limits=self._limits),
+                    timeout=self._timeout
+                )
+            )
+            self._aclient_loop = loop
+        return self.aclient
+    
+    async def aclose(self) -> None:
+        """
+        Close the async OpenAI client, if one was opened in the running event loop.
+        
+        Call this before the event loop ends; the next async call opens a new client.
+        """
+        aclient, self.aclient = self.aclient, None
+        loop, self._aclient_loop = self._aclient_loop, None
+        if aclient is not None and loop is asyncio.get_running_loop():
+            try:
+                await aclient.close()
+            except Exception as e:
+                logger.error(f"Error closing async OpenAI client: {str(e)}")
+    
+    def _load_encoding(self) -> Optional[Any]:
+        """
+        Load the tokenizer of the configured model, if tiktoken is installed.
+        
+        Returns:
+            tiktoken encoding, or None to estimate tokens from characters
+        """
+        if tiktoken is None:
+            return None
+        
+        try:
+            return tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    
+    def _estimate_tokens(self, messages: List[Dict], max_tokens: int) -> int:
+        """
+        Estimate the tokens a request counts against the rate limit.
+        
+        Args:
+            messages: List of message dictionaries for the API
+            max_tokens: Completion token limit of the request
+            
+        Returns:
+            Estimated prompt tokens plus the completion limit
+        """
+        prompt_tokens = 0
+        for message in messages:
+            content = message["content"]
+            if self._encoding is not None:
+                prompt_tokens += len(self._encoding.encode(content))
+            else:
+                # Roughly 4 characters per token
+                prompt_tokens += len(content) // 4
+            # Per-message formatting overhead
+            prompt_tokens += 4
+        
+        return prompt_tokens + max_tokens
+    
+    def _cool_down(self, error: "openai.RateLimitError") -> None:
+        """
+        Pause further requests for the Retry-After period of a 429 response.
+        
+        Args:
+            error: Rate limit error raised by the OpenAI client
+        """
+        if self.rate_limiter is None:
+            return
+        
+        retry_after = None
+        try:
+            retry_after = float(error.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        
+        self.rate_limiter.cooldown(retry_after)
+    
+    def _parse_content(self, content: str) -> Dict:
+        """
+        Parse the JSON content of a chat completion message.
+        
+        Args:
+            content: Message content returned by OpenAI
+            
+        Returns:
+            Refined dictionary of invoice fields, or an empty dict if unparsable
+        """
+        try:
+            result = jsonio.loads(content)
+            return result
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing OpenAI response: {str(e)}")
+            logger.error(f"Response content: {content}")
+            return {}
+    
+    def refine_batch(self, inputs: Dict[str, Tuple[str, Dict]]) -> Dict[str, Dict]:
+        """
+        Refine many invoices through the OpenAI Batch API.
+        
+        Batch requests cost half as much and use a separate rate-limit pool,
+        but may take up to 24 hours to complete. Cached prompts are answered
+        locally and only the remaining ones are submitted.
+        
+        Args:
+            inputs: Mapping of request id to (OCR text, initial fields)
+            
+        Returns:
+            Mapping of request id to refined dictionary of invoice fields
+        """
+        logger.info(f"Refining {len(inputs)} invoices with the OpenAI Batch API")
+        
+        prompts = {}
+        keys = {}
+        results = {}
+        for custom_id, (ocr_text, initial_fields) in inputs.items():
+            prompt = self._prepare_prompt(ocr_text, initial_fields)
+            keys[custom_id] = self._cache_key(prompt)
+            cached = self._cache_get(keys[custom_id])
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                prompts[custom_id] = prompt
+        
+        if prompts:
+            batch_id = self.submit_batch(prompts)
+            batch_results = self.poll_batch(batch_id)
+            for custom_id in prompts:
+                refined_fields = batch_results.get(custom_id, {})
+                self._cache_set(keys[custom_id], refined_fields)
+                results[custom_id] = refined_fields
+        
+        return {
+            custom_id: self._finalize(results[custom_id], initial_fields)
+            for custom_id, (_, initial_fields) in inputs.items()
+        }
+    
+    def submit_batch(self, prompts: Dict[str, List[Dict]]) -> str:
+        """
+        Upload prompts as a JSONL file and create an OpenAI batch job.
+        
+        Args:
+            prompts: Mapping of request id to messages for the API
+            
+        Returns:
+            ID of the created batch
+        """
+        lines = []
+        for custom_id, messages in prompts.items():
+            lines.append(jsonio.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": messages,
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens,
+                    "response_format": {"type": "json_object"}
+                }
+            }))
+        
+        batch_file = self.client.files.create(
+            file=("refinement_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        logger.info(f"Submitted OpenAI batch {batch.id} with {len(lines)} requests")
+        return batch.id
+    
+    def poll_batch(self, batch_id: str) -> Dict[str, Dict]:
+        """
+        Wait for an OpenAI batch job to finish and download its results.
+        
+        Status checks that fail with a connection, rate-limit or server error
+        are retried up to batch_poll_retries times in a row.
+        
+        Args:
+            batch_id: ID of the batch to wait for
+            
+        Returns:
+            Mapping of request id to refined fields (empty dict for failed requests)
+        """
+        failures = 0
+        while True:
+            try:
+                batch = self.client.batches.retrieve(batch_id)
+            except _TRANSIENT_ERRORS as e:
+                failures += 1
+                if failures > self.batch_poll_retries:
+                    raise
+                logger.warning(f"Checking OpenAI batch {batch_id} failed: {str(e)}. Retrying in {self.batch_poll_interval} seconds (attempt {failures}/{self.batch_poll_retries})")
+                time.sleep(self.batch_poll_interval)
+                continue
+            failures = 0
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                logger.error(f"OpenAI batch {batch_id} ended with status: {batch.status}")
+                return {}
+            logger.debug(f"OpenAI batch {batch_id} status: {batch.status}")
+            time.sleep(self.batch_poll_interval)
+        
+        results = {}
+        if not batch.output_file_id:
+            logger.error(f"OpenAI batch {batch_id} completed without an output file")
+            return results
+        
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = jsonio.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.error(f"OpenAI batch request {record.get('custom_id')} failed: {record.get('error')}")
+                results[record["custom_id"]] = {}
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            results[record["custom_id"]] = self._parse_content(content)
+        
+        logger.info(f"OpenAI batch {batch_id} completed with {len(results)} results")
+        return results
+    
     def _simplify_schema(self, schema: Dict) -> Dict:
         """
         Simplify JSON schema for use in prompts.
@@ -232,8 +769,12 @@ class OpenAIRefiner:
         
         if examples_path.exists():
             try:
-                with open(examples_path, 'r', encoding='utf-8') as f:
-                    all_examples = json.load(f)
+                if ijson is not None:
+                    # Stream the file and stop after the examples we need
+                    with open(examples_path, "rb") as f:
+                        return list(islice(ijson.items(f, "item", use_float=True), self.few_shot_examples))
+                
+                all_examples = jsonio.loads(examples_path.read_bytes())
                 
                 # Return the requested number of examples
                 return all_examples[:self.few_shot_examples]
@@ -252,11 +793,6 @@ class OpenAIRefiner:
             initial_fields: Initial extracted fields
         """
         try:
-            prompt_log_path = Path("docs/prompt_log.md")
-            
-            # Create parent directory if it doesn't exist
-            prompt_log_path.parent.mkdir(exist_ok=True)
-            
             # Format the log entry
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             log_entry = f"""
@@ -274,16 +810,43 @@ class OpenAIRefiner:
 
 ### Initial Fields
 ```json
-{json.dumps(initial_fields, indent=2, ensure_ascii=False)}
+{jsonio.dumps(initial_fields, indent=True)}
 ```
 
 ---
 
 """
             
-            # Append to log file
-            with open(prompt_log_path, 'a+', encoding='utf-8') as f:
-                f.write(log_entry)
+            # Append to log file (buffered; see flush_prompt_log)
+            with self._prompt_log_lock:
+                if self._prompt_log is None:
+                    self._prompt_log = self._open_prompt_log()
+                self._prompt_log.write(log_entry)
                 
         except Exception as e:
-            logger.error(f"Error logging prompt: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Error logging prompt: {str(e)}")
+    
+    def _open_prompt_log(self) -> TextIO:
+        """
+        Open the prompt log for appending, once per refiner.
+        
+        Returns:
+            Buffered text file handle, closed (and flushed) at interpreter exit
+        """
+        prompt_log_path = Path("docs/prompt_log.md")
+        
+        # Create parent directory if it doesn't exist
+        prompt_log_path.parent.mkdir(exist_ok=True)
+        
+        handle = open(prompt_log_path, 'a', buffering=1 << 16, encoding='utf-8')
+        atexit.register(handle.close)
+        return handle
+    
+    def flush_prompt_log(self) -> None:
+        """Write buffered prompt log entries to disk."""
+        with self._prompt_log_lock:
+            if self._prompt_log is not None:
+                try:
+                    self._prompt_log.flush()
+                except Exception as e:
+                    logger.error(f"Error flushing prompt log: {str(e)}") 
\ No newline at end of file
@@ -6,11 +6,16 @@ This module provides both CLI and API interfaces for the Invoice Processor appli
 """
 
 import argparse
+import asyncio
+import itertools
 import logging
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from src.ocr.confidence_merger import OCRMerger
 from src.ocr.mistral_wrapper import MistralOCR
@@ -22,10 +27,14 @@ from src.validation.schema_validator import SchemaValidator
 from src.export.writers import JSONWriter, CSVWriter, WebhookWriter
 from src.utils.logger import setup_logger
 from src.utils.cfg import ConfigLoader
+from src.utils.llm_cache import SqliteCache, file_digest
 
 # Set up logger
 logger = setup_logger(__name__)
 
+# Text of an OCR word result
+_word_text = itemgetter("text")
+
 
 class InvoiceProcessor:
     """Main class for processing invoices and extracting data."""
@@ -53,6 +62,20 @@ class InvoiceProcessor:
             "webhook": WebhookWriter(self.config)
         }
         
+        # Results of already processed documents, keyed by file digest
+        self.document_cache = None
+        if self.config["input"].get("skip_duplicates", False):
+            self.document_cache = SqliteCache(
+                self.config["input"].get("duplicate_cache_dir", ".cache/documents"),
+                name="processed_invoices"
+            )
+        
+        # Fields that must be present for the heuristic result to stand on its own
+        self._required_fields = frozenset(self.validator.schema.get("required", []))
+        
+        # Serializes merges so concurrent pipelines read their own merge confidence
+        self._merge_lock = threading.Lock()
+        
         logger.info("Invoice Processor initialized")
 
     def process(self, file_path: Union[str, Path]) -> Dict:
@@ -68,35 +91,187 @@ class InvoiceProcessor:
         file_path = Path(file_path)
         logger.info(f"Processing invoice: {file_path}")
         
+        processed_images, document_hash, duplicate = self._prepare(file_path, lazy=True)
+        if duplicate is not None:
+            return duplicate
+        
+        ocr_text, initial_fields, confidence = self._extract(processed_images)
+        
+        # Step 4: Refine with OpenAI (unless the heuristics already found everything)
+        refined_data = self._heuristic_result(initial_fields, confidence)
+        if refined_data is None:
+            refined_data = self.openai_refiner.refine(ocr_text, initial_fields)
+        
+        validated_data = self._validate(file_path, refined_data, confidence)
+        self._remember(document_hash, refined_data, validated_data)
+        
+        logger.info(f"Successfully processed invoice: {file_path}")
+        return validated_data
+    
+    def _prepare(self,
+                 file_path: Path,
+                 lazy: bool = False) -> Tuple[Iterable[str], Optional[str], Optional[Dict]]:
+        """
+        Look a file up among already processed documents, then preprocess it.
+        
+        Documents are matched on the digest of the file's bytes. A
+        perceptual hash of the pages is too coarse for this: invoices
+        printed from the same template differ only in a few numbers and
+        hash alike, and reusing one's fields for the other is wrong data.
+        
+        Args:
+            file_path: Path to the invoice file
+            lazy: Return the pages as an iterator that preprocesses them on
+                demand, so OCR of the first pages overlaps preprocessing of
+                the rest
+            
+        Returns:
+            Tuple of (processed page images, document digest or None,
+            stored result if the document was processed before or None)
+        """
+        document_hash = None
+        if self.document_cache is not None:
+            document_hash = file_digest(file_path)
+            duplicate = self.document_cache.get(document_hash)
+            if duplicate is not None:
+                logger.info(f"Skipping duplicate of {duplicate['metadata'].get('source_file')}: {file_path}")
+                duplicate["metadata"]["duplicate_of"] = duplicate["metadata"].get("source_file")
+                duplicate["metadata"]["source_file"] = file_path.name
+                return [], document_hash, duplicate
+        
         # Step 1: Preprocess the image
-        processed_images = self.image_processor.process(file_path)
+        if lazy:
+            return self.image_processor.iter_process(file_path), document_hash, None
+        return self.image_processor.process(file_path), document_hash, None
+    
+    def _remember(self, document_hash: Optional[str], refined_data: Dict, validated_data: Dict) -> None:
+        """
+        Store a processed document's result for duplicate detection.
         
-        # Step 2: Perform OCR with primary and fallback engines
-        all_results = []
-        for i, image in enumerate(processed_images):
-            logger.debug(f"OCR processing page {i+1}/{len(processed_images)}")
+        Results are only stored when OpenAI returned fields, so a failed
+        refinement is retried the next time the document is seen.
+        
+        Args:
+            document_hash: Document digest from _prepare (None when disabled)
+            refined_data: Fields refined by OpenAI
+            validated_data: Validated result returned to the caller
+        """
+        if self.document_cache is None or document_hash is None:
+            return
+        if not any(key != "metadata" for key in refined_data):
+            return
+        
+        try:
+            self.document_cache.set(document_hash, validated_data)
+        except Exception as e:
+            logger.error(f"Error storing processed invoice: {str(e)}")
+    
+    def _extract(self, processed_images: Iterable[str]) -> Tuple[str, Dict, float]:
+        """
+        Run OCR and heuristic field detection on preprocessed pages.
+        
+        Args:
+            processed_images: Paths to the preprocessed page images, as a list
+                or as an iterator that yields each page once it is ready
             
-            # Primary OCR with Mistral
-            mistral_results = self.mistral_ocr.run_ocr(image)
+        Returns:
+            Tuple of (OCR text, initially extracted fields, OCR confidence)
+        """
+        # Step 2: Perform OCR with primary and fallback engines (pages in parallel).
+        # Pages from an iterator are submitted as they are yielded, so OCR of
+        # one page runs while the next is still being preprocessed
+        workers = self.config["ocr"].get("parallel_pages", 4)
+        if isinstance(processed_images, list):
+            workers = min(len(processed_images), workers)
+        if workers > 1 or not isinstance(processed_images, list):
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                pages = list(pool.map(self._ocr_page, processed_images, itertools.count()))
+        else:
+            pages = [self._ocr_page(image, i) for i, image in enumerate(processed_images)]
+        
+        # Join each page's words as it is collected; keep the confidence of
+        # the last merged page, as reported by the merger
+        page_texts = []
+        confidence = self.ocr_merger.last_confidence
+        for page_results, page_confidence in pages:
+            page_texts.append(" ".join(map(_word_text, page_results)))
+            if page_confidence is not None:
+                confidence = page_confidence
+        
+        # Step 3: Perform field detection with heuristics
+        ocr_text = "\n".join(page_texts)
+        initial_fields = self.field_locator.extract_fields(ocr_text)
+        
+        return ocr_text, initial_fields, confidence
+    
+    def _heuristic_result(self, initial_fields: Dict, confidence: float) -> Optional[Dict]:
+        """
+        Use the heuristic fields as the result when refinement would add nothing.
+        
+        OpenAI refinement is skipped when openai.skip_if_complete is set, every
+        field required by the schema was found and the OCR confidence reaches
+        openai.skip_threshold.
+        
+        Args:
+            initial_fields: Fields found by the field locator
+            confidence: OCR confidence for the file
             
-            # Fallback OCR with Tesseract if enabled
-            tesseract_results = None
-            if self.config["tesseract_fallback"]:
-                tesseract_results = self.tesseract_ocr.run_ocr(image)
+        Returns:
+            The heuristic fields, or None if the invoice needs refinement
+        """
+        if not self.config["openai"].get("skip_if_complete", False):
+            return None
+        if confidence < self.config["openai"].get("skip_threshold", 0.9):
+            return None
+        if not self._required_fields.issubset(initial_fields):
+            return None
+        
+        logger.info("Heuristic extraction found all required fields, skipping OpenAI refinement")
+        initial_fields["metadata"]["extraction_method"] = "heuristic"
+        return initial_fields
+    
+    def _ocr_page(self, image: Union[str, Path], index: int) -> Tuple[List[Dict], Optional[float]]:
+        """
+        Run OCR on one page with the primary and fallback engines.
+        
+        Args:
+            image: Path to the preprocessed page image
+            index: Zero-based page index (for logging)
             
-            # Merge OCR results if both are available
-            if tesseract_results:
+        Returns:
+            Tuple of (OCR results, merge confidence or None if nothing was merged)
+        """
+        logger.debug(f"OCR processing page {index+1}")
+        
+        # Primary OCR with Mistral
+        mistral_results = self.mistral_ocr.run_ocr(image)
+        
+        # Fallback OCR with Tesseract if enabled
+        tesseract_results = None
+        if self.config["tesseract_fallback"]:
+            tesseract_results = self.tesseract_ocr.run_ocr(image)
+        
+        # Merge OCR results if both are available
+        if tesseract_results:
+            with self._merge_lock:
                 merged_results = self.ocr_merger.merge(mistral_results, tesseract_results)
-                all_results.append(merged_results)
-            else:
-                all_results.append(mistral_results)
+                return merged_results, self.ocr_merger.last_confidence
         
-        # Step 3: Perform field detection with heuristics
-        ocr_text = "\n".join([" ".join([word["text"] for word in page]) for page in all_results])
-        initial_fields = self.field_locator.extract_fields(ocr_text)
+        return mistral_results, None
+    
+    def _validate(self, file_path: Path, refined_data: Dict, confidence: float) -> Dict:
+        """
+        Validate refined data and attach processing metadata.
         
-        # Step 4: Refine with OpenAI
-        refined_data = self.openai_refiner.refine(ocr_text, initial_fields)
+        Args:
+            file_path: Path to the invoice file
+            refined_data: Fields refined by OpenAI (or the heuristic fields)
+            confidence: OCR confidence for the file
+            
+        Returns:
+            Dict containing the extracted and validated invoice data
+        """
+        extraction_metadata = refined_data.get("metadata", {})
         
         # Step 5: Validate against schema
         validated_data = self.validator.validate(refined_data)
@@ -105,19 +280,21 @@ class InvoiceProcessor:
         validated_data["metadata"] = {
             "source_file": file_path.name,
             "ocr_engine": "hybrid" if self.config["tesseract_fallback"] else "mistral",
-            "extraction_timestamp": self.openai_refiner.last_timestamp,
-            "confidence_score": self.ocr_merger.last_confidence
+            "extraction_method": extraction_metadata.get("extraction_method"),
+            "extraction_timestamp": extraction_metadata.get("extraction_timestamp"),
+            "confidence_score": confidence
         }
         
-        logger.info(f"Successfully processed invoice: {file_path}")
         return validated_data
     
-    def batch_process(self, directory_path: Union[str, Path]) -> List[Dict]:
+    def batch_process(self, directory_path: Union[str, Path], use_batch_api: bool = False) -> List[Dict]:
         """
         Process all invoice files in a directory.
         
         Args:
             directory_path: Path to directory containing invoice files
+            use_batch_api: Refine all invoices in one OpenAI Batch API job
+                (cheaper, but may take hours) instead of one request each
             
         Returns:
             List of dictionaries containing extracted and validated data
@@ -127,15 +304,146 @@ class InvoiceProcessor:
         
         results = []
         allowed_extensions = self.config["input"]["allowed_formats"]
+        file_paths = [
+            file_path for file_path in directory_path.iterdir()
+            if file_path.suffix.lower()[1:] in allowed_extensions
+        ]
+        group_size = self.config["openai"].get("batch_group_size", 1)
         
-        for file_path in directory_path.iterdir():
-            if file_path.suffix.lower()[1:] in allowed_extensions:
+        if use_batch_api or group_size > 1:
+            # Run OCR and heuristics locally first, then refine many invoices per request
+            prepared = []
+            for file_path in file_paths:
+                try:
+                    processed_images, document_hash, duplicate = self._prepare(file_path)
+                    if duplicate is not None:
+                        results.append(duplicate)
+                        continue
+                    prepared.append((file_path, document_hash, processed_images))
+                except Exception as e:
+                    logger.error(f"Failed to process {file_path}: {str(e)}")
+            
+            if use_batch_api and self.mistral_ocr.cache is not None:
+                # OCR every page in one Mistral batch job; the per-page OCR
+                # below is then answered from the OCR cache
+                try:
+                    self.mistral_ocr.run_ocr_batch([
+                        image for _, _, processed_images in prepared for image in processed_images
+                    ])
+                except Exception as e:
+                    logger.error(f"Mistral batch OCR failed, OCRing pages individually: {str(e)}")
+            
+            extracted = []
+            for file_path, document_hash, processed_images in prepared:
+                try:
+                    extracted.append((file_path, document_hash, *self._extract(processed_images)))
+                except Exception as e:
+                    logger.error(f"Failed to process {file_path}: {str(e)}")
+            
+            # Only invoices the heuristics could not complete go to OpenAI
+            refined_list = [
+                self._heuristic_result(initial_fields, confidence)
+                for _, _, _, initial_fields, confidence in extracted
+            ]
+            pending = [i for i, refined_data in enumerate(refined_list) if refined_data is None]
+            
+            if use_batch_api and pending:
+                # One Batch API job for the whole directory
+                try:
+                    refined = self.openai_refiner.refine_batch({
+                        extracted[i][0].name: (extracted[i][2], extracted[i][3]) for i in pending
+                    })
+                    for i in pending:
+                        refined_list[i] = refined[extracted[i][0].name]
+                    pending = []
+                except Exception as e:
+                    logger.error(f"OpenAI Batch API failed, refining invoices with chat completions: {str(e)}")
+            
+            # One chat completion per group of invoices
+            for start in range(0, len(pending), group_size):
+                group = pending[start:start + group_size]
+                group_results = self.openai_refiner.refine_many([
+                    (extracted[i][2], extracted[i][3]) for i in group
+                ])
+                for i, refined_data in zip(group, group_results):
+                    refined_list[i] = refined_data
+            
+            for (file_path, document_hash, _, _, confidence), refined_data in zip(extracted, refined_list):
+                try:
+                    validated_data = self._validate(file_path, refined_data, confidence)
+                    self._remember(document_hash, refined_data, validated_data)
+                    results.append(validated_data)
+                except Exception as e:
+                    logger.error(f"Failed to process {file_path}: {str(e)}")
+        else:
+            for file_path in file_paths:
                 try:
                     result = self.process(file_path)
                     results.append(result)
                 except Exception as e:
                     logger.error(f"Failed to process {file_path}: {str(e)}")
         
+        self.openai_refiner.flush_prompt_log()
+        
+        logger.info(f"Batch processing complete. Processed {len(results)} invoices.")
+        return results
+    
+    async def abatch_process(self, directory_path: Union[str, Path], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Process all invoice files in a directory concurrently.
+        
+        OCR and field detection run in worker threads, and OpenAI refinement
+        uses the async client, so several invoices are in flight at once.
+        
+        Args:
+            directory_path: Path to directory containing invoice files
+            max_concurrency: Maximum number of invoices processed at once
+                (defaults to openai.max_concurrency from the config)
+            
+        Returns:
+            List of dictionaries containing extracted and validated data
+        """
+        directory_path = Path(directory_path)
+        max_concurrency = max_concurrency or self.config["openai"].get("max_concurrency", 4)
+        logger.info(f"Batch processing invoices in: {directory_path} (concurrency {max_concurrency})")
+        
+        allowed_extensions = self.config["input"]["allowed_formats"]
+        file_paths = [
+            file_path for file_path in directory_path.iterdir()
+            if file_path.suffix.lower()[1:] in allowed_extensions
+        ]
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        loop = asyncio.get_running_loop()
+        
+        async def process_file(file_path: Path) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    logger.info(f"Processing invoice: {file_path}")
+                    processed_images, document_hash, duplicate = await loop.run_in_executor(None, self._prepare, file_path, True)
+                    if duplicate is not None:
+                        return duplicate
+                    ocr_text, initial_fields, confidence = await loop.run_in_executor(None, self._extract, processed_images)
+                    refined_data = self._heuristic_result(initial_fields, confidence)
+                    if refined_data is None:
+                        refined_data = await self.openai_refiner.arefine(ocr_text, initial_fields)
+                    validated_data = self._validate(file_path, refined_data, confidence)
+                    self._remember(document_hash, refined_data, validated_data)
+                    logger.info(f"Successfully processed invoice: {file_path}")
+                    return validated_data
+                except Exception as e:
+                    logger.error(f"Failed to process {file_path}: {str(e)}")
+                    return None
+        
+        try:
+            outcomes = await asyncio.gather(*(process_file(file_path) for file_path in file_paths))
+        finally:
+            # The async client's connections die with this event loop
+            await self.openai_refiner.aclose()
+        results = [result for result in outcomes if result is not None]
+        
+        self.openai_refiner.flush_prompt_log()
+        
         logger.info(f"Batch processing complete. Processed {len(results)} invoices.")
         return results
     
@@ -170,6 +478,7 @@ def main():
     process_parser.add_argument("--output", "-o", help="Output file path")
     process_parser.add_argument("--format", "-f", choices=["json", "csv", "webhook"], default="json", help="Output format")
     process_parser.add_argument("--config", "-c", help="Path to custom config file")
+    process_parser.add_argument("--no-cache", action="store_true", help="Always process invoices instead of reusing cached results")
     
     # Batch process invoices
     batch_parser = subparsers.add_parser("batch", help="Process multiple invoices in a directory")
@@ -177,6 +486,9 @@ def main():
     batch_parser.add_argument("--output", "-o", help="Output directory path")
     batch_parser.add_argument("--format", "-f", choices=["json", "csv", "webhook"], default="json", help="Output format")
     batch_parser.add_argument("--config", "-c", help="Path to custom config file")
+    batch_parser.add_argument("--concurrency", type=int, help="Number of invoices processed concurrently")
+    batch_parser.add_argument("--batch-api", action="store_true", help="Refine with the OpenAI Batch API (cheaper, may take up to 24h)")
+    batch_parser.add_argument("--no-cache", action="store_true", help="Always process invoices instead of reusing cached results")
     
     args = parser.parse_args()
     
@@ -185,6 +497,10 @@ def main():
         sys.exit(1)
     
     processor = InvoiceProcessor(args.config if hasattr(args, "config") else None)
+    if args.no_cache:
+        processor.openai_refiner.cache = None
+        processor.mistral_ocr.cache = None
+        processor.document_cache = None
     
     if args.command == "process":
         result = processor.process(args.file)
@@ -192,7 +508,10 @@ def main():
         print(f"Invoice processed successfully. Output: {output}")
     
     elif args.command == "batch":
-        results = processor.batch_process(args.directory)
+        if args.batch_api or processor.config["openai"].get("batch_group_size", 1) > 1:
+            results = processor.batch_process(args.directory, use_batch_api=args.batch_api)
+        else:
+            results = asyncio.run(processor.abatch_process(args.directory, args.concurrency))
         output = processor.export(results, args.format, args.output)
         print(f"Batch processing complete. Processed {len(results)} invoices. Output: {output}")
 
@@ -4,15 +4,98 @@ OCR Confidence Merger
 This module merges results from multiple OCR engines based on confidence scores.
 """
 
-from typing import Dict, List, Optional, Tuple
+import bisect
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # Optional accelerator, fall back to the NumPy sweep
+    njit = None
+
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
+def _overlap_pairs(primary_boxes: np.ndarray,
+                   primary_area: np.ndarray,
+                   primary_usable: np.ndarray,
+                   fallback_boxes: np.ndarray,
+                   fallback_area: np.ndarray,
+                   order: np.ndarray,
+                   tops: np.ndarray,
+                   max_height: float,
+                   threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar kernel of the overlap sweep, compiled with numba when available.
+    
+    Args:
+        primary_boxes: (N, 4) primary boxes
+        primary_area: (N,) primary box areas
+        primary_usable: (N,) True for primary boxes that can overlap
+        fallback_boxes: (M, 4) fallback boxes
+        fallback_area: (M,) fallback box areas
+        order: Usable fallback indexes sorted by top edge
+        tops: Top edges of the fallback boxes in order
+        max_height: Tallest usable fallback box height
+        threshold: Minimum overlap ratio
+        
+    Returns:
+        Tuple of (offsets, indexes): the overlapping fallback words of primary
+        word p are indexes[offsets[p]:offsets[p + 1]], in ascending order
+    """
+    count = primary_boxes.shape[0]
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    indexes = np.empty(max(16, count), dtype=np.int64)
+    found = 0
+    
+    for p in range(count):
+        offsets[p] = found
+        if not primary_usable[p]:
+            continue
+        
+        x1, y1, x2, y2 = primary_boxes[p, 0], primary_boxes[p, 1], primary_boxes[p, 2], primary_boxes[p, 3]
+        lo = np.searchsorted(tops, y1 - max_height, side="left")
+        hi = np.searchsorted(tops, y2, side="right")
+        
+        for j in range(lo, hi):
+            f = order[j]
+            x_left = max(x1, fallback_boxes[f, 0])
+            y_top = max(y1, fallback_boxes[f, 1])
+            x_right = min(x2, fallback_boxes[f, 2])
+            y_bottom = min(y2, fallback_boxes[f, 3])
+            if x_right < x_left or y_bottom < y_top:
+                continue
+            
+            intersection = (x_right - x_left) * (y_bottom - y_top)
+            if intersection / min(primary_area[p], fallback_area[f]) >= threshold:
+                if found == len(indexes):
+                    grown = np.empty(2 * len(indexes), dtype=np.int64)
+                    grown[:found] = indexes[:found]
+                    indexes = grown
+                indexes[found] = f
+                found += 1
+        
+        indexes[offsets[p]:found] = np.sort(indexes[offsets[p]:found])
+    
+    offsets[count] = found
+    return offsets, indexes[:found]
+
+
+# Native version of the kernel; cache=True keeps the compiled code across runs
+_overlap_pairs_jit = njit(cache=True)(_overlap_pairs) if njit is not None else None
+
+
+class _WordArrays(NamedTuple):
+    """Geometry and confidence of OCR words as parallel arrays."""
+    
+    boxes: np.ndarray  # (N, 4) float boxes as (x1, y1, x2, y2), zeros when missing
+    valid: np.ndarray  # (N,) True for words with a full 4-coordinate box
+    conf: np.ndarray   # (N,) confidence scores, 0 when missing
+
+
 class OCRMerger:
     """
     Merges and selects the best results from multiple OCR engines.
@@ -45,29 +128,40 @@ class OCRMerger:
         Returns:
             Merged OCR results
         """
+        # Word confidences are read once here and shared by all strategies
+        primary_confs = self._confidences(primary_results)
+        
         # If no fallback results, return primary
         if fallback_results is None or len(fallback_results) == 0:
-            self.last_confidence = self._calculate_avg_confidence(primary_results)
+            self.last_confidence = self._calculate_avg_confidence(primary_confs)
             logger.debug(f"No fallback results provided. Using primary results with avg confidence: {self.last_confidence:.2f}")
             return primary_results
         
+        fallback_confs = self._confidences(fallback_results)
+        
         if len(primary_results) == 0:
-            self.last_confidence = self._calculate_avg_confidence(fallback_results)
+            self.last_confidence = self._calculate_avg_confidence(fallback_confs)
             logger.debug(f"No primary results provided. Using fallback results with avg confidence: {self.last_confidence:.2f}")
             return fallback_results
         
         # Calculate confidence metrics
-        primary_conf = self._calculate_avg_confidence(primary_results)
-        fallback_conf = self._calculate_avg_confidence(fallback_results)
+        primary_conf = self._calculate_avg_confidence(primary_confs)
+        fallback_conf = self._calculate_avg_confidence(fallback_confs)
         logger.debug(f"Primary OCR confidence: {primary_conf:.2f}, Fallback OCR confidence: {fallback_conf:.2f}")
         
         # Choose strategy for merging
         if self.strategy == "highest_confidence":
-            return self._merge_highest_confidence(primary_results, fallback_results)
+            return self._merge_highest_confidence(primary_results, fallback_results, primary_conf, fallback_conf)
         elif self.strategy == "line_by_line":
-            return self._merge_line_by_line(primary_results, fallback_results)
+            return self._merge_line_by_line(
+                primary_results, fallback_results,
+                self._word_arrays(primary_results, primary_confs), self._word_arrays(fallback_results, fallback_confs)
+            )
         elif self.strategy == "word_by_word":
-            return self._merge_word_by_word(primary_results, fallback_results)
+            return self._merge_word_by_word(
+                primary_results, fallback_results,
+                self._word_arrays(primary_results, primary_confs), self._word_arrays(fallback_results, fallback_confs)
+            )
         else:
             # Default to highest overall confidence
             if primary_conf >= fallback_conf:
@@ -77,36 +171,49 @@ class OCRMerger:
                 self.last_confidence = fallback_conf
                 return fallback_results
     
-    def _calculate_avg_confidence(self, results: List[Dict]) -> float:
+    def _confidences(self, results: List[Dict]) -> np.ndarray:
         """
-        Calculate average confidence score for OCR results.
+        Read the confidence of every OCR word into an array.
         
         Args:
             results: OCR results
             
+        Returns:
+            Confidence scores, 0 when missing
+        """
+        return np.fromiter((word.get("conf", 0.0) for word in results), dtype=np.float64, count=len(results))
+    
+    def _calculate_avg_confidence(self, confidences: np.ndarray) -> float:
+        """
+        Calculate average confidence score for OCR results.
+        
+        Args:
+            confidences: Word confidences from _confidences
+            
         Returns:
             Average confidence score (0.0-1.0)
         """
-        if not results:
+        if not len(confidences):
             return 0.0
-        return sum(word.get("conf", 0.0) for word in results) / len(results)
+        return sum(confidences.tolist()) / len(confidences)
     
     def _merge_highest_confidence(self, 
                                  primary_results: List[Dict], 
-                                 fallback_results: List[Dict]) -> List[Dict]:
+                                 fallback_results: List[Dict],
+                                 primary_conf: float,
+                                 fallback_conf: float) -> List[Dict]:
         """
         Merge by choosing the set with highest overall confidence.
         
         Args:
             primary_results: Results from primary OCR
             fallback_results: Results from fallback OCR
+            primary_conf: Average confidence of the primary results
+            fallback_conf: Average confidence of the fallback results
             
         Returns:
             The set of results with highest overall confidence
         """
-        primary_conf = self._calculate_avg_confidence(primary_results)
-        fallback_conf = self._calculate_avg_confidence(fallback_results)
-        
         if primary_conf >= fallback_conf:
             logger.info(f"Using primary OCR results (conf: {primary_conf:.2f} >= {fallback_conf:.2f})")
             self.last_confidence = primary_conf
@@ -118,20 +225,24 @@ class OCRMerger:
     
     def _merge_line_by_line(self, 
                            primary_results: List[Dict], 
-                           fallback_results: List[Dict]) -> List[Dict]:
+                           fallback_results: List[Dict],
+                           primary_arrays: _WordArrays,
+                           fallback_arrays: _WordArrays) -> List[Dict]:
         """
         Merge by comparing results line by line and choosing highest confidence.
         
         Args:
             primary_results: Results from primary OCR
             fallback_results: Results from fallback OCR
+            primary_arrays: Word arrays of the primary results
+            fallback_arrays: Word arrays of the fallback results
             
         Returns:
             Merged results with best lines from each source
         """
         # Group words by lines based on vertical position
-        primary_lines = self._group_by_lines(primary_results)
-        fallback_lines = self._group_by_lines(fallback_results)
+        primary_lines = self._group_by_lines(primary_results, primary_arrays)
+        fallback_lines = self._group_by_lines(fallback_results, fallback_arrays)
         
         # For each line position, choose the one with higher confidence
         merged_results = []
@@ -139,12 +250,16 @@ class OCRMerger:
         line_count = 0
         
         # Process all line positions from both sources
-        all_y_positions = sorted(set(list(primary_lines.keys()) + list(fallback_lines.keys())))
+        all_y_positions = sorted(set(primary_lines) | set(fallback_lines))
+        
+        # Sorted line positions of each source for binary-search lookups
+        primary_index = self._key_index(primary_lines)
+        fallback_index = self._key_index(fallback_lines)
         
         for y_pos in all_y_positions:
             # Find closest line in each source
-            primary_key = self._find_closest_key(primary_lines.keys(), y_pos)
-            fallback_key = self._find_closest_key(fallback_lines.keys(), y_pos)
+            primary_key = self._find_closest_key(primary_index, y_pos)
+            fallback_key = self._find_closest_key(fallback_index, y_pos)
             
             primary_line = primary_lines.get(primary_key, [])
             fallback_line = fallback_lines.get(fallback_key, [])
@@ -178,54 +293,57 @@ class OCRMerger:
     
     def _merge_word_by_word(self, 
                            primary_results: List[Dict], 
-                           fallback_results: List[Dict]) -> List[Dict]:
+                           fallback_results: List[Dict],
+                           primary_arrays: _WordArrays,
+                           fallback_arrays: _WordArrays) -> List[Dict]:
         """
         Merge by comparing words with similar positions and choosing highest confidence.
         
         Args:
             primary_results: Results from primary OCR
             fallback_results: Results from fallback OCR
+            primary_arrays: Word arrays of the primary results
+            fallback_arrays: Word arrays of the fallback results
             
         Returns:
             Merged results with best words from each source
         """
         merged_results = []
-        used_fallback_indices = set()
+        used_fallback = np.zeros(len(fallback_results), dtype=bool)
+        fallback_conf = fallback_arrays.conf
+        primary_conf_values = primary_arrays.conf.tolist()
+        fallback_conf_values = fallback_conf.tolist()
         total_confidence = 0.0
         
+        # Overlapping fallback words for every primary word, found with a sweep
+        overlaps = self._overlap_candidates(primary_arrays, fallback_arrays)
+        
         # For each word in primary results, find potential matches in fallback
-        for primary_word in primary_results:
-            primary_box = primary_word.get("box", (0, 0, 0, 0))
-            
+        for p, primary_word in enumerate(primary_results):
             # Find potential matching words in fallback (by position overlap)
-            matches = []
-            for i, fallback_word in enumerate(fallback_results):
-                if i in used_fallback_indices:
-                    continue
-                    
-                fallback_box = fallback_word.get("box", (0, 0, 0, 0))
-                if self._boxes_overlap(primary_box, fallback_box):
-                    matches.append((i, fallback_word))
+            matches = overlaps[p]
+            if len(matches):
+                matches = matches[~used_fallback[matches]]
             
             # If matches found, compare confidence and choose best
-            if matches:
-                best_match_idx, best_match = max(matches, key=lambda x: x[1].get("conf", 0))
-                if best_match.get("conf", 0) > primary_word.get("conf", 0):
-                    merged_results.append(best_match)
-                    used_fallback_indices.add(best_match_idx)
-                    total_confidence += best_match.get("conf", 0)
+            # (argmax keeps the lowest index on ties)
+            if len(matches):
+                best_match_idx = matches[np.argmax(fallback_conf[matches])]
+                if fallback_conf_values[best_match_idx] > primary_conf_values[p]:
+                    merged_results.append(fallback_results[best_match_idx])
+                    used_fallback[best_match_idx] = True
+                    total_confidence += fallback_conf_values[best_match_idx]
                 else:
                     merged_results.append(primary_word)
-                    total_confidence += primary_word.get("conf", 0)
+                    total_confidence += primary_conf_values[p]
             else:
                 merged_results.append(primary_word)
-                total_confidence += primary_word.get("conf", 0)
+                total_confidence += primary_conf_values[p]
         
         # Add remaining fallback words that weren't matched
-        for i, fallback_word in enumerate(fallback_results):
-            if i not in used_fallback_indices:
-                merged_results.append(fallback_word)
-                total_confidence += fallback_word.get("conf", 0)
+        for i in np.flatnonzero(~used_fallback).tolist():
+            merged_results.append(fallback_results[i])
+            total_confidence += fallback_conf_values[i]
         
         # Calculate overall confidence
         self.last_confidence = total_confidence / max(1, len(merged_results))
@@ -233,73 +351,173 @@ class OCRMerger:
         
         return merged_results
     
-    def _group_by_lines(self, results: List[Dict]) -> Dict[int, List[Dict]]:
+    def _group_by_lines(self, results: List[Dict], arrays: _WordArrays) -> Dict[int, List[Dict]]:
         """
         Group OCR words by their vertical position (line).
         
         Args:
             results: OCR results
+            arrays: Word arrays of the results
             
         Returns:
             Dictionary mapping y-positions to lists of words
         """
         lines = {}
         
-        for word in results:
-            # Get the vertical middle of the word
-            box = word.get("box", (0, 0, 0, 0))
-            if len(box) >= 4:
-                y_middle = (box[1] + box[3]) // 2
-                
-                # Group with a tolerance to account for slight misalignments
-                line_key = (y_middle // 10) * 10  # Round to nearest 10px
-                
-                if line_key not in lines:
-                    lines[line_key] = []
-                lines[line_key].append(word)
+        # Vertical middle of each word with a full box, rounded down to 10px
+        # to account for slight misalignments
+        indexes = np.flatnonzero(arrays.valid)
+        y_middle = (arrays.boxes[indexes, 1] + arrays.boxes[indexes, 3]) // 2
+        line_keys = (y_middle // 10) * 10
+        
+        for i, line_key in zip(indexes.tolist(), line_keys.tolist()):
+            if line_key not in lines:
+                lines[line_key] = []
+            lines[line_key].append(results[i])
         
         return lines
     
-    def _find_closest_key(self, keys, target_key):
-        """Find the closest key in a collection of keys to the target key."""
-        if not keys:
+    def _key_index(self, lines: Dict[int, List[Dict]]) -> Tuple[List[int], Dict[int, int]]:
+        """
+        Index line positions for closest-key lookups.
+        
+        Args:
+            lines: Dictionary mapping y-positions to lists of words
+            
+        Returns:
+            Tuple of (sorted y-positions, insertion rank of each y-position)
+        """
+        return sorted(lines), {key: rank for rank, key in enumerate(lines)}
+    
+    def _find_closest_key(self, key_index: Tuple[List[int], Dict[int, int]], target_key: int) -> Optional[int]:
+        """
+        Find the closest key to the target key.
+        
+        Uses binary search over the sorted keys. When two keys are equally
+        close, the one inserted first wins, as with a linear min() scan.
+        
+        Args:
+            key_index: Index built by _key_index
+            target_key: Key to look up
+            
+        Returns:
+            Closest key, or None if there are no keys
+        """
+        sorted_keys, rank = key_index
+        if not sorted_keys:
             return None
-        return min(keys, key=lambda k: abs(k - target_key)) if keys else None
+        
+        i = bisect.bisect_left(sorted_keys, target_key)
+        if i == 0:
+            return sorted_keys[0]
+        if i == len(sorted_keys):
+            return sorted_keys[-1]
+        
+        below, above = sorted_keys[i - 1], sorted_keys[i]
+        below_distance, above_distance = target_key - below, above - target_key
+        if below_distance != above_distance:
+            return below if below_distance < above_distance else above
+        return below if rank[below] < rank[above] else above
     
-    def _boxes_overlap(self, box1, box2, threshold=0.3):
+    def _overlap_candidates(self,
+                            primary_arrays: _WordArrays,
+                            fallback_arrays: _WordArrays,
+                            threshold: float = 0.3) -> List[np.ndarray]:
         """
-        Check if two bounding boxes overlap with a given threshold.
+        Find the fallback words whose boxes overlap each primary word.
+        
+        Two boxes overlap when their intersection covers at least the
+        threshold ratio of the smaller box. Boxes with fewer than 4
+        coordinates or no area never overlap.
+        
+        Fallback boxes are sorted by their top edge, so each primary word is
+        only compared with the band of boxes that can reach it vertically
+        (usually the words on the same line) instead of the whole page.
         
         Args:
-            box1, box2: Boxes in format (x1, y1, x2, y2)
+            primary_arrays: Word arrays of the primary results
+            fallback_arrays: Word arrays of the fallback results
             threshold: Minimum overlap ratio to consider boxes as overlapping
             
         Returns:
-            True if boxes overlap with at least the threshold ratio
+            For each primary word, ascending indexes of overlapping fallback words
         """
-        # Ensure boxes have 4 coordinates
-        if len(box1) < 4 or len(box2) < 4:
-            return False
+        primary_boxes, primary_valid = primary_arrays.boxes, primary_arrays.valid
+        fallback_boxes, fallback_valid = fallback_arrays.boxes, fallback_arrays.valid
+        
+        # Calculate areas
+        primary_area = (primary_boxes[:, 2] - primary_boxes[:, 0]) * (primary_boxes[:, 3] - primary_boxes[:, 1])
+        fallback_area = (fallback_boxes[:, 2] - fallback_boxes[:, 0]) * (fallback_boxes[:, 3] - fallback_boxes[:, 1])
+        
+        no_overlap = np.empty(0, dtype=np.intp)
+        candidates = [no_overlap] * len(primary_boxes)
+        
+        usable = np.flatnonzero(fallback_valid & (fallback_area > 0))
+        if len(usable) == 0 or len(primary_boxes) == 0:
+            return candidates
+        
+        # Sort usable fallback boxes by top edge; a box can only reach down
+        # to its top edge plus the tallest box height
+        order = usable[np.argsort(fallback_boxes[usable, 1], kind="stable")]
+        tops = fallback_boxes[order, 1]
+        max_height = np.max(fallback_boxes[order, 3] - fallback_boxes[order, 1])
+        primary_usable = primary_valid & (primary_area > 0)
+        
+        if _overlap_pairs_jit is not None:
+            # Compiled scalar loop, avoids per-word NumPy call overhead
+            offsets, indexes = _overlap_pairs_jit(
+                primary_boxes, primary_area, primary_usable,
+                fallback_boxes, fallback_area, order, tops, max_height, threshold
+            )
+            return np.split(indexes, offsets[1:-1])
+        
+        for p in np.flatnonzero(primary_usable):
+            box = primary_boxes[p]
+            lo = np.searchsorted(tops, box[1] - max_height, side="left")
+            hi = np.searchsorted(tops, box[3], side="right")
+            if lo >= hi:
+                continue
+            
+            band = order[lo:hi]
+            F = fallback_boxes[band]
+            
+            # Calculate intersection
+            x_left = np.maximum(box[0], F[:, 0])
+            y_top = np.maximum(box[1], F[:, 1])
+            x_right = np.minimum(box[2], F[:, 2])
+            y_bottom = np.minimum(box[3], F[:, 3])
+            intersection = (x_right - x_left) * (y_bottom - y_top)
             
-        # Calculate intersection
-        x_left = max(box1[0], box2[0])
-        y_top = max(box1[1], box2[1])
-        x_right = min(box1[2], box2[2])
-        y_bottom = min(box1[3], box2[3])
-        
-        if x_right < x_left or y_bottom < y_top:
-            return False  # No overlap
+            # Calculate overlap ratio
+            overlap_ratio = intersection / np.minimum(primary_area[p], fallback_area[band])
             
-        intersection = (x_right - x_left) * (y_bottom - y_top)
+            overlapping = (x_right >= x_left) & (y_bottom >= y_top) & (overlap_ratio >= threshold)
+            candidates[p] = np.sort(band[overlapping])
         
-        # Calculate areas
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
+        return candidates
+    
+    def _word_arrays(self, results: List[Dict], conf: np.ndarray) -> _WordArrays:
+        """
+        Convert OCR words into parallel geometry and confidence arrays.
+        
+        Done once per merge so the strategies work on contiguous arrays
+        instead of reading each word's box and confidence repeatedly.
         
-        if area1 <= 0 or area2 <= 0:
-            return False
+        Args:
+            results: OCR results
+            conf: Word confidences from _confidences
             
-        # Calculate overlap ratio
-        overlap_ratio = intersection / min(area1, area2)
+        Returns:
+            Word arrays for the results
+        """
+        count = len(results)
+        boxes = np.zeros((count, 4), dtype=np.float64)
+        valid = np.zeros(count, dtype=bool)
+        
+        for i, word in enumerate(results):
+            box = word.get("box", (0, 0, 0, 0))
+            if len(box) >= 4:
+                boxes[i] = box[:4]
+                valid[i] = True
         
-        return overlap_ratio >= threshold 
\ No newline at end of file
+        return _WordArrays(boxes, valid, conf)
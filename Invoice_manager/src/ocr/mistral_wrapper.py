@@ -5,22 +5,118 @@ This module provides a wrapper around the Mistral OCR API for extracting text fr
 Supports direct PDF processing as well as image-based OCR with fallback to Tesseract.
 """
 
+import asyncio
+import atexit
 import os
 import base64
-import json
+import mimetypes
 import tempfile
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Union, Any, Optional
+from typing import Dict, List, NamedTuple, Tuple, Union, Any, Optional
 from datetime import datetime
 import random
+import socket
 
+import httpx
 from mistralai import Mistral, SDKError
 
+try:
+    import h2
+except ImportError:  # Optional, httpx falls back to HTTP/1.1 without it
+    h2 = None
+
+try:
+    import tesserocr
+except ImportError:  # Optional, fall back to running the tesseract binary via pytesseract
+    tesserocr = None
+
+from src.utils import jsonio
+from src.utils.llm_cache import SqliteCache, file_digest, make_key
 from src.utils.logger import setup_logger
+from src.utils.rate_limiter import AdaptiveLimiter
 
 logger = setup_logger(__name__)
 
+# Model used for native OCR requests
+_OCR_MODEL = "mistral-ocr-latest"
+
+# Structured extraction prompt used with native OCR markdown (the page text is appended)
+_NATIVE_EXTRACTION_PROMPT = (
+    "Extract the following information from this Spanish invoice, using EXACTLY these field names and formats:\n\n"
+    "- invoice_number: The invoice identifier\n"
+    "- issue_date: Date in DD/MM/YYYY format (e.g., 01/05/2024)\n"
+    "- vendor_name: Company issuing the invoice\n"
+    "- vendor_tax_id: Spanish tax ID (NIF/CIF) with format like B12345678\n"
+    "- vendor_address: Full address of vendor\n"
+    "- buyer_name: Name of customer\n"
+    "- buyer_tax_id: Customer tax ID\n"
+    "- buyer_address: Full address of buyer\n"
+    "- taxable_base: Base amount before tax, with comma as decimal separator (e.g., 100,50 €)\n"
+    "- vat_rate: VAT percentage with % symbol (e.g., 21%)\n"
+    "- vat_amount: VAT amount with comma as decimal separator (e.g., 21,11 €)\n"
+    "- total_amount: Total invoice amount with comma as decimal separator (e.g., 121,61 €)\n"
+    "- payment_terms: Payment terms if available\n"
+    "- currency: EUR, USD, or GBP\n"
+    "- line_items: Array of items with description, qty, unit_price, and line_total fields\n\n"
+    "Here is the invoice text:\n\n"
+)
+
+# HTTP statuses worth retrying: timeouts, rate limits and transient server errors
+_RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Errors retried by _execute_with_retry; connection errors have their own, smaller budget
+_CONNECTION_ERRORS = (httpx.ConnectError, httpx.ReadTimeout)
+_RETRYABLE_ERRORS = (SDKError,) + _CONNECTION_ERRORS
+
+# Fields worth a vision-model pass when the text-only extraction misses them
+_CRITICAL_FIELDS = frozenset({"invoice_number", "total_eur", "total_amount", "vendor_tax_id"})
+
+# Bytes read per step when base64-encoding files (a multiple of 3, so the
+# encoded chunks concatenate into one valid base64 string)
+_BASE64_CHUNK = 57 * 1024
+
+# Placeholder box shared by every word result (Mistral OCR returns no word positions)
+_ZERO_BOX = (0, 0, 0, 0)
+
+# Send small requests immediately instead of waiting to coalesce them (Nagle)
+_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
+
+class _CachedPage(NamedTuple):
+    """Page of an OCR response restored from the cache."""
+    
+    markdown: str
+
+
+class _CachedOCRResponse(NamedTuple):
+    """OCR response restored from the cache (only the page markdown is kept)."""
+    
+    pages: List[_CachedPage]
+
+
+def _encode_file_base64(file_path: Union[str, Path]) -> str:
+    """
+    Base64-encode a file in chunks instead of reading it whole.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Base64 encoding of the file bytes
+    """
+    parts = []
+    with open(file_path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            # Let the kernel read ahead aggressively for this front-to-back read
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        for chunk in iter(lambda: f.read(_BASE64_CHUNK), b""):
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
 
 class MistralOCR:
     """Wrapper for Mistral OCR for text extraction from images and PDFs."""
@@ -39,27 +135,124 @@ class MistralOCR:
         
         # Retry settings
         self.max_retries = config["ocr"]["mistral"].get("max_retries", 3)
-        self.base_retry_delay = config["ocr"]["mistral"].get("base_retry_delay", 2)
+        self.base_retry_delay = config["ocr"]["mistral"].get("base_retry_delay", 0.1)
         self.max_retry_delay = config["ocr"]["mistral"].get("max_retry_delay", 30)
+        self.max_connection_retries = config["ocr"]["mistral"].get("max_connection_retries", 1)
+        
+        # Spaces out requests once the API starts rate limiting; shared by all calls on this instance
+        self.limiter = None
+        if config["ocr"]["mistral"].get("adaptive_rate_limit", True):
+            self.limiter = AdaptiveLimiter(max_interval=config["ocr"]["mistral"].get("max_request_interval", 10.0))
         
         # Ensure API key is set
         self.api_key = os.environ.get("MISTRAL_API_KEY")
         if not self.api_key:
             logger.warning("MISTRAL_API_KEY environment variable not set. OCR functionality will be limited.")
         
-        # Initialize Mistral client
-        self.client = Mistral(api_key=self.api_key)
+        # Initialize Mistral client. Its HTTP clients keep connections alive (multiplexed
+        # over HTTP/2 when h2 is installed), so uploads, OCR and chat calls skip the handshake
+        mistral_config = config["ocr"]["mistral"]
+        limits = httpx.Limits(
+            max_connections=mistral_config.get("max_connections", 64),
+            max_keepalive_connections=mistral_config.get("max_keepalive_connections", 32),
+            keepalive_expiry=mistral_config.get("keepalive_expiry", 60)
+        )
+        http2 = mistral_config.get("http2", True) and h2 is not None
+        self.client = Mistral(
+            api_key=self.api_key,
+            client=httpx.Client(
+                transport=httpx.HTTPTransport(http2=http2, limits=limits, socket_options=_SOCKET_OPTIONS),
+                timeout=self.timeout
+            ),
+            async_client=httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(http2=http2, limits=limits, socket_options=_SOCKET_OPTIONS),
+                timeout=self.timeout
+            )
+        )
+        
+        # Cache of OCR and extraction results keyed by file contents (None to always call the API)
+        self.cache = None
+        if config["ocr"]["mistral"].get("cache_enabled", True):
+            self.cache = SqliteCache(
+                config["ocr"]["mistral"].get("cache_dir", ".cache/ocr"),
+                name="mistral",
+                max_bytes=config["ocr"]["mistral"].get("cache_max_bytes")
+            )
+        
+        self.batch_poll_interval = config["ocr"]["mistral"].get("batch_poll_interval", 30)
+        self.max_concurrency = config["ocr"]["mistral"].get("max_concurrency", 8)
+        
+        # PDFs up to this size are sent inline with the OCR request instead of uploaded first
+        self.inline_max_bytes = config["ocr"]["mistral"].get("inline_max_bytes", 10 * 1024 * 1024)
+        
+        # Second extraction pass with the vision model when critical fields are missing
+        self.enable_vision_fallback = config["ocr"]["mistral"].get("enable_vision_fallback", True)
+        
+        # Base64 encodings of recently read files, keyed by path and validated by mtime and size
+        self._b64_cache: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._b64_cache_size = config["ocr"]["mistral"].get("base64_cache_size", 4)
+        self._b64_lock = threading.Lock()
+        
+        # Encodes images for the vision pass while the text-only request is in flight
+        self._encode_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mistral-encode")
+        
+        # Native OCR response of the last call (None when it fell back to another engine)
+        self.last_ocr_response: Optional[Any] = None
+        
+        # Native OCR response of the current run_ocr call, per thread
+        self._local = threading.local()
+        
+        # In-process Tesseract engine for the fallback, loaded on first use
+        self._tesseract_api = None
+        self._tesseract_lock = threading.Lock()
         
         # Schema path for structured extraction
         self.schema_path = Path(config["validation"]["schema"])
         if not self.schema_path.exists():
             logger.warning(f"Schema file not found at {self.schema_path}. Structured extraction may be limited.")
+            self._schema_description_json = None
+            self._required_fields = []
+        else:
+            # The schema-derived parts of the extraction prompts are the same for every invoice
+            with open(self.schema_path, 'rb') as f:
+                schema = jsonio.loads(f.read())
+            
+            # Simplify schema description for prompt
+            schema_description = {}
+            for key, value in schema.get("properties", {}).items():
+                if not key.startswith("//") and not key == "metadata":
+                    schema_description[key] = value.get("description", "")
+            
+            self._schema_description_json = jsonio.dumps(schema_description, indent=True)
+            self._required_fields = schema.get("required", [])
+        
+        if self._schema_description_json is not None:
+            self._extract_prompt_prefix = (
+                "Extract structured data from this Spanish invoice OCR text according to this schema:\n\n"
+                f"{self._schema_description_json}\n\n"
+                "The OCR text of the invoice is:\n\n"
+            )
+            self._extract_prompt_suffix = (
+                "\n\n"
+                "Return ONLY a valid JSON object with the extracted fields according to the schema. "
+                "For Spanish invoices, look for fields like: 'Factura', 'Número', 'Fecha', 'NIF/CIF', "
+                "'Emisor', 'Destinatario', 'Base Imponible', 'IVA', etc. For date fields, use DD/MM/YYYY format."
+            )
+            self._vision_prompt_prefix = (
+                "This is a Spanish invoice image. Extract ALL the structured data according to this schema:\n\n"
+                f"{self._schema_description_json}\n\n"
+                "For reference, this is the OCR text already extracted:\n\n"
+            )
+            self._document_prompt = (
+                "Extract structured data from the attached Spanish invoice according to this schema:"
+                f"\n\n{self._schema_description_json}" + self._extract_prompt_suffix
+            )
         
         logger.info(f"Initialized Mistral OCR with model: {self.model}")
     
     def _execute_with_retry(self, func, *args, **kwargs):
         """
-        Execute a function with retry logic for handling rate limits.
+        Execute a function with retry logic for rate limits and transient errors.
         
         Args:
             func: Function to execute
@@ -70,23 +263,126 @@ class MistralOCR:
             Result of the function call
         """
         retries = 0
+        connection_retries = 0
         while True:
             try:
-                return func(*args, **kwargs)
-            except SDKError as e:
-                # Check if this is a rate limit error (status code 429)
-                if hasattr(e, 'status_code') and e.status_code == 429 and retries < self.max_retries:
-                    retries += 1
-                    # Exponential backoff with jitter
-                    delay = min(self.base_retry_delay * (2 ** retries) + random.uniform(0, 1), self.max_retry_delay)
-                    logger.warning(f"Rate limit exceeded. Retrying in {delay:.2f} seconds (attempt {retries}/{self.max_retries})")
-                    time.sleep(delay)
-                else:
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                result = func(*args, **kwargs)
+                if self.limiter is not None:
+                    self.limiter.on_success()
+                return result
+            except _RETRYABLE_ERRORS as e:
+                connection_retries += isinstance(e, _CONNECTION_ERRORS)
+                if not self._should_retry(e, retries, connection_retries):
                     # Re-raise for other errors or if max retries exceeded
                     raise
-            except Exception as e:
-                # Re-raise any other exceptions
-                raise
+                retries += 1
+                delay = self._retry_delay(retries, e)
+                logger.warning(f"{self._retry_reason(e)}. Retrying in {delay:.2f} seconds (attempt {retries}/{self.max_retries})")
+                time.sleep(delay)
+    
+    def _should_retry(self, error: Exception, retries: int, connection_retries: int) -> bool:
+        """
+        Decide whether a failed request is retried.
+        
+        Rate limits and transient server errors are retried up to max_retries
+        times, connection errors at most max_connection_retries times so a
+        down endpoint is not hammered. Other errors are raised right away.
+        
+        Args:
+            error: Error raised by the request
+            retries: Number of retries already made
+            connection_retries: Number of connection errors so far, including this one
+            
+        Returns:
+            True if the request should be retried
+        """
+        status_code = getattr(error, "status_code", None)
+        if status_code == 429 and self.limiter is not None:
+            self.limiter.on_rate_limited()
+        
+        if retries >= self.max_retries:
+            return False
+        if isinstance(error, _CONNECTION_ERRORS):
+            return connection_retries <= self.max_connection_retries
+        return status_code in _RETRYABLE_STATUS
+    
+    def _retry_reason(self, error: Exception) -> str:
+        """
+        Describe a retried error for the log.
+        
+        Args:
+            error: Error raised by the request
+            
+        Returns:
+            Short description of the error
+        """
+        status_code = getattr(error, "status_code", None)
+        if status_code == 429:
+            return "Rate limit exceeded"
+        if status_code is not None:
+            return f"Mistral API returned HTTP {status_code}"
+        return f"Connection to Mistral API failed ({type(error).__name__})"
+    
+    def _retry_delay(self, retries: int, error: Exception) -> float:
+        """
+        Compute how long to wait before retrying a failed request.
+        
+        Uses exponential backoff with full jitter, so concurrent clients
+        spread their retries instead of retrying in lockstep, and never
+        retries before the server's Retry-After time.
+        
+        Args:
+            retries: Number of the upcoming retry (1 for the first)
+            error: Error raised by the Mistral client
+            
+        Returns:
+            Delay in seconds
+        """
+        cap = min(self.max_retry_delay, self.base_retry_delay * (2 ** min(retries, 20)))
+        delay = random.uniform(0, cap)
+        
+        headers = getattr(error, "headers", None) or getattr(getattr(error, "raw_response", None), "headers", None)
+        if headers:
+            try:
+                delay = max(delay, float(headers.get("Retry-After")))
+            except (TypeError, ValueError):
+                pass
+        
+        return delay
+    
+    async def _execute_with_retry_async(self, func, *args, **kwargs):
+        """
+        Await a coroutine function with retry logic for rate limits and transient errors.
+        
+        Args:
+            func: Coroutine function to execute
+            *args: Arguments to pass to the function
+            **kwargs: Keyword arguments to pass to the function
+            
+        Returns:
+            Result of the function call
+        """
+        retries = 0
+        connection_retries = 0
+        while True:
+            try:
+                if self.limiter is not None:
+                    await self.limiter.aacquire()
+                result = await func(*args, **kwargs)
+                if self.limiter is not None:
+                    self.limiter.on_success()
+                return result
+            except _RETRYABLE_ERRORS as e:
+                connection_retries += isinstance(e, _CONNECTION_ERRORS)
+                if not self._should_retry(e, retries, connection_retries):
+                    # Re-raise for other errors or if max retries exceeded
+                    raise
+                retries += 1
+                delay = self._retry_delay(retries, e)
+                logger.warning(f"{self._retry_reason(e)}. Retrying in {delay:.2f} seconds (attempt {retries}/{self.max_retries})")
+                await asyncio.sleep(delay)
     
     def run_ocr(self, file_path: Union[str, Path]) -> List[Dict]:
         """
@@ -103,24 +399,44 @@ class MistralOCR:
         
         try:
             # Convert path to string if it's a Path object
+            path = Path(file_path)
             file_path = str(file_path)
-            start_time = datetime.now()
             
             # Check if file exists
-            if not Path(file_path).exists():
+            if not path.exists():
                 raise FileNotFoundError(f"File not found: {file_path}")
             
+            # Reuse the result of an earlier run on the same file contents
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self._ocr_cache_key(file_path)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self.last_ocr_response = _CachedOCRResponse([_CachedPage(markdown) for markdown in cached["pages"]])
+                    logger.info(f"Reused cached Mistral OCR result for: {file_path}")
+                    return self._cached_results(cached)
+            
+            self.last_ocr_response = None
+            self._local.ocr_response = None
+            
             # Determine file type
-            file_ext = Path(file_path).suffix.lower()
+            file_ext = path.suffix.lower()
             
             # Process based on file type
             if file_ext == ".pdf":
-                return self.process_pdf(file_path)
+                results = self.process_pdf(file_path)
             elif file_ext in [".jpg", ".jpeg", ".png", ".tiff", ".tif"]:
-                return self.process_image(file_path)
+                results = self.process_image(file_path)
             else:
                 logger.warning(f"Unsupported file format: {file_ext}. Attempting to process as image.")
-                return self.process_image(file_path)
+                results = self.process_image(file_path)
+            
+            # Only native OCR results are cached; fallbacks are retried next time
+            ocr_response = self._local.ocr_response
+            if cache_key is not None and ocr_response is not None:
+                self._cache_ocr(cache_key, [page.markdown for page in ocr_response.pages], results)
+            
+            return results
                 
         except Exception as e:
             logger.error(f"Error running Mistral OCR: {str(e)}")
@@ -137,54 +453,27 @@ class MistralOCR:
             List of dictionaries containing text and confidence scores
         """
         try:
-            start_time = datetime.now()
-            
-            # Upload PDF to Mistral API
-            with open(pdf_path, "rb") as pdf_file:
-                upload_result = self._execute_with_retry(
-                    self.client.files.upload,
-                    file={
-                        "file_name": Path(pdf_path).name,
-                        "content": pdf_file
-                    },
-                    purpose="ocr"
-                )
+            start_ns = time.perf_counter_ns()
             
-            # Get a signed URL for processing
-            signed_url = self._execute_with_retry(
-                self.client.files.get_signed_url,
-                file_id=upload_result.id
-            )
+            # Small PDFs go inline in a single request; large ones are
+            # uploaded first and referenced by a signed URL
+            if os.path.getsize(pdf_path) <= self.inline_max_bytes:
+                document = self._inline_document(pdf_path)
+            else:
+                document = {"type": "document_url", "document_url": self._upload_for_ocr(pdf_path)}
             
             # Process the PDF with Mistral OCR
             ocr_response = self._execute_with_retry(
                 self.client.ocr.process,
-                model="mistral-ocr-latest",
-                document={
-                    "type": "document_url",
-                    "document_url": signed_url.url
-                }
+                model=_OCR_MODEL,
+                document=document
             )
             
             # Convert OCR response to a format compatible with existing code
-            results = []
             confidence = 0.95  # Native OCR has high confidence
+            results = self._pages_to_results([page.markdown for page in ocr_response.pages], confidence)
             
-            # Extract text from all pages
-            for page_idx, page in enumerate(ocr_response.pages):
-                words = page.markdown.split()
-                
-                # Add each word to results
-                for word in words:
-                    results.append({
-                        "text": word,
-                        "conf": confidence,
-                        "box": (0, 0, 0, 0),  # Placeholder box coordinates
-                        "page": page_idx
-                    })
-            
-            end_time = datetime.now()
-            processing_time = (end_time - start_time).total_seconds() * 1000  # in milliseconds
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6  # in milliseconds
             
             num_words = len(results)
             num_pages = len(ocr_response.pages)
@@ -192,29 +481,383 @@ class MistralOCR:
             
             # Store the OCR response in the instance for later use
             self.last_ocr_response = ocr_response
+            self._local.ocr_response = ocr_response
             
             return results
                 
         except Exception as e:
             logger.error(f"Error processing PDF with Mistral OCR: {str(e)}")
-            # Try to convert PDF to image and use image processing as fallback
-            logger.info("Attempting to convert PDF to image and process with fallback method")
-            from pdf2image import convert_from_path
+            return self._process_pdf_as_image(pdf_path, e)
+    
+    def _upload_for_ocr(self, file_path: str) -> str:
+        """
+        Upload a file for OCR and get a signed URL to reference it.
+        
+        The file is streamed from disk, so it is never held in memory as
+        raw bytes plus a base64 copy.
+        
+        Args:
+            file_path: Path to the PDF or image file
             
-            try:
-                # Convert first page of PDF to image
-                with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-                    temp_path = temp_file.name
-                
-                images = convert_from_path(pdf_path, first_page=1, last_page=1)
-                if images:
-                    images[0].save(temp_path)
-                    return self.process_image(temp_path)
-                else:
-                    raise RuntimeError("Failed to convert PDF to image")
-            except Exception as conv_error:
-                logger.error(f"Error converting PDF to image: {str(conv_error)}")
-                raise RuntimeError(f"PDF processing failed: {str(e)}")
+        Returns:
+            Signed URL of the uploaded file
+        """
+        with open(file_path, "rb") as f:
+            upload_result = self._execute_with_retry(
+                self.client.files.upload,
+                file={
+                    "file_name": Path(file_path).name,
+                    "content": f
+                },
+                purpose="ocr"
+            )
+        
+        signed_url = self._execute_with_retry(
+            self.client.files.get_signed_url,
+            file_id=upload_result.id
+        )
+        return signed_url.url
+    
+    async def _aupload_for_ocr(self, file_path: str) -> str:
+        """
+        Async variant of _upload_for_ocr.
+        
+        Args:
+            file_path: Path to the PDF or image file
+            
+        Returns:
+            Signed URL of the uploaded file
+        """
+        with open(file_path, "rb") as f:
+            upload_result = await self._execute_with_retry_async(
+                self.client.files.upload_async,
+                file={
+                    "file_name": Path(file_path).name,
+                    "content": f
+                },
+                purpose="ocr"
+            )
+        
+        signed_url = await self._execute_with_retry_async(
+            self.client.files.get_signed_url_async,
+            file_id=upload_result.id
+        )
+        return signed_url.url
+    
+    def _process_pdf_as_image(self, pdf_path: str, error: Exception) -> List[Dict]:
+        """
+        Fall back to image OCR of the first PDF page when native PDF OCR fails.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            error: Error raised by native PDF OCR
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        # Try to convert PDF to image and use image processing as fallback
+        logger.info("Attempting to convert PDF to image and process with fallback method")
+        self.last_ocr_response = None
+        from pdf2image import convert_from_path
+        
+        try:
+            # Convert first page of PDF to image; the JPEG is removed with its directory
+            images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=200)
+            if not images:
+                raise RuntimeError("Failed to convert PDF to image")
+            
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_path = os.path.join(temp_dir, "page.jpg")
+                images[0].convert("RGB").save(temp_path, format="JPEG", quality=90)
+                results = self.process_image(temp_path)
+            
+            # A first-page result must not be cached as the OCR of the whole PDF
+            self._local.ocr_response = None
+            return results
+        except Exception as conv_error:
+            logger.error(f"Error converting PDF to image: {str(conv_error)}")
+            raise RuntimeError(f"PDF processing failed: {str(error)}")
+    
+    async def run_ocr_many_async(self,
+                                 file_paths: List[Union[str, Path]],
+                                 max_concurrency: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """
+        Run OCR on many files concurrently with the async Mistral endpoints.
+        
+        Network round-trips of different files overlap, with at most
+        max_concurrency files in flight at once.
+        
+        Args:
+            file_paths: Paths to PDF or image files
+            max_concurrency: Maximum number of files processed at once
+                (defaults to ocr.mistral.max_concurrency from the config)
+            
+        Returns:
+            Mapping of file path to OCR results (files that failed are left out)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        
+        async def process_file(file_path: str) -> Optional[List[Dict]]:
+            async with semaphore:
+                try:
+                    return await self.arun_ocr(file_path)
+                except Exception as e:
+                    logger.error(f"Failed to OCR {file_path}: {str(e)}")
+                    return None
+        
+        file_paths = [str(file_path) for file_path in file_paths]
+        outcomes = await asyncio.gather(*(process_file(file_path) for file_path in file_paths))
+        return {
+            file_path: results
+            for file_path, results in zip(file_paths, outcomes)
+            if results is not None
+        }
+    
+    async def arun_ocr(self, file_path: Union[str, Path]) -> List[Dict]:
+        """
+        Async variant of run_ocr.
+        
+        The native OCR requests are awaited; the fallbacks (PDF to image,
+        vision model, Tesseract) run in a worker thread.
+        
+        Args:
+            file_path: Path to the PDF or image file
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        path = Path(file_path)
+        file_path = str(file_path)
+        if not path.exists():
+            raise RuntimeError(f"Mistral OCR failed: File not found: {file_path}")
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._ocr_cache_key(file_path)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.last_ocr_response = _CachedOCRResponse([_CachedPage(markdown) for markdown in cached["pages"]])
+                logger.info(f"Reused cached Mistral OCR result for: {file_path}")
+                return self._cached_results(cached)
+        
+        is_pdf = path.suffix.lower() == ".pdf"
+        try:
+            if is_pdf and os.path.getsize(file_path) <= self.inline_max_bytes:
+                document = self._inline_document(file_path)
+            elif is_pdf:
+                document = {"type": "document_url", "document_url": await self._aupload_for_ocr(file_path)}
+            else:
+                document = {"type": "image_url", "image_url": await self._aupload_for_ocr(file_path)}
+            
+            ocr_response = await self._execute_with_retry_async(
+                self.client.ocr.process_async,
+                model=_OCR_MODEL,
+                document=document
+            )
+            if not is_pdf and not ocr_response.pages:
+                raise RuntimeError("No text extracted from image")
+            
+            pages = [page.markdown for page in ocr_response.pages]
+            # Images only use their first page, as in process_image
+            word_pages = pages if is_pdf else pages[:1]
+        except Exception as e:
+            logger.error(f"Error in async Mistral OCR call: {str(e)}")
+            if is_pdf:
+                return await asyncio.to_thread(self._process_pdf_as_image, file_path, e)
+            return await asyncio.to_thread(self._legacy_process_image, file_path)
+        
+        results = self._pages_to_results(word_pages, 0.95)
+        self.last_ocr_response = ocr_response
+        if cache_key is not None:
+            self._cache_ocr(cache_key, pages, results)
+        
+        logger.info(f"Mistral OCR processed {len(results)} words across {len(word_pages)} pages")
+        return results
+    
+    def run_ocr_batch(self, file_paths: List[Union[str, Path]]) -> Dict[str, List[Dict]]:
+        """
+        Run OCR on many files with one Mistral Batch API job.
+        
+        Batch requests cost half as much as individual ones and are not
+        limited by per-request latency, but may take a long time to complete.
+        Files already in the cache are answered locally, and the job's results
+        are stored in the cache, so later run_ocr calls on the same files
+        return without an API call.
+        
+        Args:
+            file_paths: Paths to PDF or image files
+            
+        Returns:
+            Mapping of file path to OCR results (files whose request failed are left out)
+        """
+        logger.info(f"Running Mistral OCR on {len(file_paths)} files with the Batch API")
+        
+        results = {}
+        pending = {}
+        for index, file_path in enumerate(file_paths):
+            file_path = str(file_path)
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self._ocr_cache_key(file_path)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[file_path] = self._cached_results(cached)
+                    continue
+            pending[str(index)] = (file_path, cache_key)
+        
+        if pending:
+            job_id = self.submit_ocr_batch({custom_id: file_path for custom_id, (file_path, _) in pending.items()})
+            for custom_id, pages in self.poll_ocr_batch(job_id).items():
+                file_path, cache_key = pending[custom_id]
+                # Images only use their first page, as in process_image
+                word_pages = pages if Path(file_path).suffix.lower() == ".pdf" else pages[:1]
+                results[file_path] = self._pages_to_results(word_pages, 0.95)
+                if cache_key is not None:
+                    self._cache_ocr(cache_key, pages, results[file_path])
+        
+        return results
+    
+    def submit_ocr_batch(self, file_paths: Dict[str, str]) -> str:
+        """
+        Upload OCR requests as a JSONL file and create a Mistral batch job.
+        
+        Documents are sent inline as base64 data URLs, so the whole job takes
+        a single upload instead of an upload and signed URL per file.
+        
+        Args:
+            file_paths: Mapping of request id to file path
+            
+        Returns:
+            ID of the created batch job
+        """
+        # Read and encode the files concurrently; file reads release the GIL
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            documents = pool.map(self._inline_document, file_paths.values())
+            lines = [
+                jsonio.dumps_bytes({"custom_id": custom_id, "body": {"document": document}})
+                for custom_id, document in zip(file_paths, documents)
+            ]
+        
+        batch_file = self._execute_with_retry(
+            self.client.files.upload,
+            file={
+                "file_name": "ocr_batch.jsonl",
+                "content": b"\n".join(lines)
+            },
+            purpose="batch"
+        )
+        job = self._execute_with_retry(
+            self.client.batch.jobs.create,
+            input_files=[batch_file.id],
+            model=_OCR_MODEL,
+            endpoint="/v1/ocr"
+        )
+        
+        logger.info(f"Submitted Mistral batch {job.id} with {len(lines)} OCR requests")
+        return job.id
+    
+    def poll_ocr_batch(self, job_id: str) -> Dict[str, List[str]]:
+        """
+        Wait for a Mistral batch job to finish and download its results.
+        
+        Args:
+            job_id: ID of the batch job to wait for
+            
+        Returns:
+            Mapping of request id to page markdown (failed requests are left out)
+        """
+        while True:
+            job = self._execute_with_retry(self.client.batch.jobs.get, job_id=job_id)
+            if job.status == "SUCCESS":
+                break
+            if job.status in ("FAILED", "TIMEOUT_EXCEEDED", "CANCELLED"):
+                logger.error(f"Mistral batch {job_id} ended with status: {job.status}")
+                return {}
+            logger.debug(f"Mistral batch {job_id} status: {job.status}")
+            time.sleep(self.batch_poll_interval)
+        
+        results = {}
+        if not job.output_file:
+            logger.error(f"Mistral batch {job_id} completed without an output file")
+            return results
+        
+        output = self._execute_with_retry(self.client.files.download, file_id=job.output_file).read()
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = jsonio.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.error(f"Mistral batch request {record.get('custom_id')} failed: {record.get('error')}")
+                continue
+            results[record["custom_id"]] = [page["markdown"] for page in response["body"]["pages"]]
+        
+        logger.info(f"Mistral batch {job_id} returned {len(results)} OCR results")
+        return results
+    
+    def _inline_document(self, file_path: str) -> Dict[str, str]:
+        """
+        Build an OCR document reference that embeds the file as base64.
+        
+        Args:
+            file_path: Path to the PDF or image file
+            
+        Returns:
+            Document dictionary for the OCR endpoint
+        """
+        encoded = self._b64_for(file_path)
+        
+        if Path(file_path).suffix.lower() == ".pdf":
+            return {"type": "document_url", "document_url": f"data:application/pdf;base64,{encoded}"}
+        
+        mime_type = mimetypes.guess_type(file_path)[0] or "image/jpeg"
+        return {"type": "image_url", "image_url": f"data:{mime_type};base64,{encoded}"}
+    
+    def _b64_for(self, file_path: str) -> str:
+        """
+        Get the base64 encoding of a file, reusing it while the file is unchanged.
+        
+        The same file is often encoded twice in a row (e.g. for OCR and then
+        for the vision extraction pass), so the last few encodings are kept.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            Base64 encoding of the file bytes
+        """
+        stat = os.stat(file_path)
+        with self._b64_lock:
+            cached = self._b64_cache.get(file_path)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._b64_cache.move_to_end(file_path)
+                return cached[2]
+        
+        encoded = _encode_file_base64(file_path)
+        
+        with self._b64_lock:
+            self._b64_cache[file_path] = (stat.st_mtime_ns, stat.st_size, encoded)
+            self._b64_cache.move_to_end(file_path)
+            while len(self._b64_cache) > self._b64_cache_size:
+                self._b64_cache.popitem(last=False)
+        return encoded
+    
+    def _pages_to_results(self, pages: List[str], confidence: float) -> List[Dict]:
+        """
+        Split page markdown into word results.
+        
+        Args:
+            pages: Markdown of each page
+            confidence: Confidence assigned to every word
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        return [
+            {"text": word, "conf": confidence, "box": _ZERO_BOX, "page": page_idx}
+            for page_idx, markdown in enumerate(pages)
+            for word in markdown.split()
+        ]
     
     def process_image(self, image_path: str) -> List[Dict]:
         """
@@ -227,48 +870,35 @@ class MistralOCR:
             List of dictionaries containing text and confidence scores
         """
         try:
-            start_time = datetime.now()
+            start_ns = time.perf_counter_ns()
             
             # First try with native Mistral OCR
             try:
-                with open(image_path, "rb") as img_file:
-                    img_data = img_file.read()
-                    
-                # Create base64 encoded image
-                encoded = base64.b64encode(img_data).decode()
+                # Upload the image (streamed from disk) and reference it by URL
+                signed_url = self._upload_for_ocr(image_path)
                 
                 # Process with Mistral OCR
                 ocr_response = self._execute_with_retry(
                     self.client.ocr.process,
-                    model="mistral-ocr-latest",
+                    model=_OCR_MODEL,
                     document={
                         "type": "image_url",
-                        "image_url": f"data:image/jpeg;base64,{encoded}"
+                        "image_url": signed_url
                     }
                 )
                 
                 # Convert OCR response to expected format
-                results = []
                 confidence = 0.95
                 
                 # Extract text from response
                 if ocr_response.pages and len(ocr_response.pages) > 0:
-                    words = ocr_response.pages[0].markdown.split()
-                    
-                    # Add each word to results
-                    for word in words:
-                        results.append({
-                            "text": word,
-                            "conf": confidence,
-                            "box": (0, 0, 0, 0),  # Placeholder
-                            "page": 0
-                        })
+                    results = self._pages_to_results([ocr_response.pages[0].markdown], confidence)
                     
                     # Store the OCR response
                     self.last_ocr_response = ocr_response
+                    self._local.ocr_response = ocr_response
                     
-                    end_time = datetime.now()
-                    processing_time = (end_time - start_time).total_seconds() * 1000
+                    processing_time = (time.perf_counter_ns() - start_ns) / 1e6
                     
                     num_words = len(results)
                     logger.info(f"Mistral OCR processed {num_words} words with confidence: {confidence:.2f} in {processing_time:.2f}ms")
@@ -296,10 +926,11 @@ class MistralOCR:
         Returns:
             List of dictionaries containing text and confidence scores
         """
+        self.last_ocr_response = None
+        
         try:
             # Try with vision model first
-            with open(image_path, "rb") as img_file:
-                encoded = base64.b64encode(img_file.read()).decode()
+            encoded = self._b64_for(image_path)
             
             try:
                 # Call Mistral API with vision capability
@@ -327,7 +958,7 @@ class MistralOCR:
                     {
                         "text": word,
                         "conf": confidence,
-                        "box": (0, 0, 0, 0),  # Placeholder box coordinates
+                        "box": _ZERO_BOX,
                         "page": 0  # Default page number
                     }
                     for word in words
@@ -357,9 +988,10 @@ class MistralOCR:
         Returns:
             List of dictionaries containing text and confidence scores
         """
+        self.last_ocr_response = None
+        
         try:
             # Process using Tesseract
-            import pytesseract
             from PIL import Image
             
             logger.info(f"Using Tesseract fallback for OCR processing of {image_path}")
@@ -368,7 +1000,11 @@ class MistralOCR:
             pil_image = Image.open(image_path)
             
             # Perform OCR with Tesseract
-            text = pytesseract.image_to_string(pil_image, lang=self.lang)
+            if tesserocr is not None:
+                text = self._tesseract_text(pil_image)
+            else:
+                import pytesseract
+                text = pytesseract.image_to_string(pil_image, lang=self.lang)
             
             # For compatibility with the existing code, create a word-level structure
             words = text.split()
@@ -376,7 +1012,7 @@ class MistralOCR:
                 {
                     "text": word,
                     "conf": 0.90,  # Default confidence 
-                    "box": (0, 0, 0, 0),  # Placeholder bounding box
+                    "box": _ZERO_BOX,
                     "page": 0  # Default page
                 }
                 for word in words
@@ -390,6 +1026,109 @@ class MistralOCR:
             logger.error(f"Error running Tesseract fallback OCR: {str(e)}")
             raise RuntimeError(f"OCR processing failed: {str(e)}")
     
+    def _tesseract_text(self, image: Any) -> str:
+        """
+        Read the text of an image with an in-process Tesseract engine.
+        
+        The engine and its language data are loaded once and reused, instead
+        of starting a tesseract process per image.
+        
+        Args:
+            image: PIL image to read
+            
+        Returns:
+            Text recognized in the image
+        """
+        with self._tesseract_lock:
+            if self._tesseract_api is None:
+                self._tesseract_api = tesserocr.PyTessBaseAPI(lang=self.lang)
+                atexit.register(self._tesseract_api.End)
+            
+            self._tesseract_api.SetImage(image)
+            return self._tesseract_api.GetUTF8Text()
+    
+    def _ocr_cache_key(self, file_path: str) -> str:
+        """
+        Build the cache key of a file's OCR result.
+        
+        Args:
+            file_path: Path to the PDF or image file
+            
+        Returns:
+            Cache key over the OCR model and the file contents
+        """
+        return make_key(kind="ocr", model=_OCR_MODEL, file=file_digest(file_path))
+    
+    def _cached_results(self, cached: Dict) -> List[Dict]:
+        """
+        Rebuild word results from a cached OCR result.
+        
+        Args:
+            cached: Value stored by _cache_ocr
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        return [
+            {"text": text, "conf": conf, "box": _ZERO_BOX, "page": page}
+            for text, conf, page in cached["words"]
+        ]
+    
+    def _cache_ocr(self, key: str, pages: List[str], results: List[Dict]) -> None:
+        """
+        Store a native OCR result in the cache.
+        
+        Args:
+            key: Cache key from _ocr_cache_key
+            pages: Markdown of each page of the OCR response
+            results: Word results returned for the file
+        """
+        self._cache_set(key, {
+            "pages": pages,
+            "words": [(word["text"], word["conf"], word["page"]) for word in results]
+        })
+    
+    def _cache_set(self, key: str, value: Any) -> None:
+        """
+        Store a result in the cache, logging instead of failing on errors.
+        
+        Args:
+            key: Cache key
+            value: JSON-serializable result
+        """
+        try:
+            self.cache.set(key, value)
+        except Exception as e:
+            logger.error(f"Error storing Mistral result in cache: {str(e)}")
+    
+    def _chat_content(self, **request: Any) -> str:
+        """
+        Call the chat completion endpoint, reusing cached responses.
+        
+        The cache key covers the whole request (model, messages and
+        parameters), so a change to the prompt or schema is a cache miss.
+        
+        Args:
+            **request: Keyword arguments for client.chat.complete
+            
+        Returns:
+            Content of the first choice of the response
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_key(kind="chat", **request)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"Reused cached Mistral {request.get('model')} response")
+                return cached
+        
+        response = self._execute_with_retry(self.client.chat.complete, **request)
+        content = response.choices[0].message.content
+        
+        if cache_key is not None:
+            self._cache_set(cache_key, content)
+        return content
+    
     def get_text_from_results(self, results: List[Dict]) -> str:
         """
         Extract plain text from OCR results.
@@ -409,10 +1148,80 @@ class MistralOCR:
         Returns:
             List of markdown strings for each page, or None if no OCR response is available
         """
-        if hasattr(self, 'last_ocr_response'):
+        if self.last_ocr_response is not None:
             return [page.markdown for page in self.last_ocr_response.pages]
         return None
     
+    def ocr_and_extract(self, file_path: Union[str, Path]) -> Dict[str, Any]:
+        """
+        Read an invoice and extract its structured data in a single chat request.
+        
+        The document is attached to the extraction prompt, so there is no
+        separate OCR round-trip and no markdown sent back and forth. Use this
+        when only the structured fields are needed; run_ocr followed by
+        extract_structured_data still provides the word list.
+        
+        Args:
+            file_path: Path to the PDF or image file
+            
+        Returns:
+            Dictionary with structured invoice data (empty on failure)
+        """
+        try:
+            path = Path(file_path)
+            file_path = str(file_path)
+            start_ns = time.perf_counter_ns()
+            
+            if self._schema_description_json is None:
+                raise FileNotFoundError(f"Schema file not found: {self.schema_path}")
+            
+            # Attach the document the same way the OCR endpoint receives it
+            if path.suffix.lower() == ".pdf":
+                if os.path.getsize(file_path) <= self.inline_max_bytes:
+                    document = self._inline_document(file_path)
+                else:
+                    document = {"type": "document_url", "document_url": self._upload_for_ocr(file_path)}
+            else:
+                document = {"type": "image_url", "image_url": self._upload_for_ocr(file_path)}
+            
+            chat_content = self._chat_content(
+                model="mistral-large-latest",
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": self._document_prompt},
+                            document
+                        ]
+                    }
+                ],
+                response_format={"type": "json_object"},
+                temperature=0
+            )
+            
+            structured_data = jsonio.loads(chat_content)
+            
+            # Add metadata
+            if "metadata" not in structured_data:
+                structured_data["metadata"] = {}
+            
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            structured_data["metadata"].update({
+                "source_file": path.name,
+                "processing_duration_ms": int(processing_time),
+                "extraction_method": "mistral_document",
+                "ocr_engine": "mistral_chat",
+                "confidence_score": 0.95
+            })
+            
+            logger.info(f"Extracted {len(structured_data)} fields with a single Mistral document request")
+            return structured_data
+            
+        except Exception as e:
+            logger.error(f"Error in combined OCR and extraction: {str(e)}")
+            return {}
+    
     def extract_structured_data(self, file_path: Union[str, Path], ocr_text: Optional[str] = None) -> Dict[str, Any]:
         """
         Use Mistral to extract structured data from OCR text based on our invoice schema.
@@ -427,10 +1236,11 @@ class MistralOCR:
         """
         try:
             file_path = str(file_path)
-            start_time = datetime.now()
+            source_file = Path(file_path).name
+            start_ns = time.perf_counter_ns()
             
             # Check if we have native OCR results
-            has_native_results = hasattr(self, 'last_ocr_response')
+            has_native_results = self.last_ocr_response is not None
             
             # If we have native OCR results, process directly
             if has_native_results:
@@ -440,31 +1250,12 @@ class MistralOCR:
                 first_page_md = self.last_ocr_response.pages[0].markdown if self.last_ocr_response.pages else ""
                 
                 # Extract structured data using an LLM with a schema-aligned prompt
-                chat_response = self._execute_with_retry(
-                    self.client.chat.complete,
-                    model="mistral-large-latest", 
+                chat_content = self._chat_content(
+                    model="mistral-large-latest",
                     messages=[
                         {
                             "role": "user",
-                            "content": (
-                                "Extract the following information from this Spanish invoice, using EXACTLY these field names and formats:\n\n"
-                                "- invoice_number: The invoice identifier\n"
-                                "- issue_date: Date in DD/MM/YYYY format (e.g., 01/05/2024)\n"
-                                "- vendor_name: Company issuing the invoice\n"
-                                "- vendor_tax_id: Spanish tax ID (NIF/CIF) with format like B12345678\n"
-                                "- vendor_address: Full address of vendor\n"
-                                "- buyer_name: Name of customer\n"
-                                "- buyer_tax_id: Customer tax ID\n"
-                                "- buyer_address: Full address of buyer\n"
-                                "- taxable_base: Base amount before tax, with comma as decimal separator (e.g., 100,50 €)\n"
-                                "- vat_rate: VAT percentage with % symbol (e.g., 21%)\n"
-                                "- vat_amount: VAT amount with comma as decimal separator (e.g., 21,11 €)\n"
-                                "- total_amount: Total invoice amount with comma as decimal separator (e.g., 121,61 €)\n"
-                                "- payment_terms: Payment terms if available\n"
-                                "- currency: EUR, USD, or GBP\n"
-                                "- line_items: Array of items with description, qty, unit_price, and line_total fields\n\n"
-                                f"Here is the invoice text:\n\n{first_page_md}"
-                            )
+                            "content": _NATIVE_EXTRACTION_PROMPT + first_page_md
                         }
                     ],
                     response_format={"type": "json_object"},
@@ -472,16 +1263,16 @@ class MistralOCR:
                 )
                 
                 # Parse the structured data
-                structured_data = json.loads(chat_response.choices[0].message.content)
+                structured_data = jsonio.loads(chat_content)
                 
                 # Add metadata
                 if "metadata" not in structured_data:
                     structured_data["metadata"] = {}
                 
-                processing_time = (datetime.now() - start_time).total_seconds() * 1000
+                processing_time = (time.perf_counter_ns() - start_ns) / 1e6
                 
                 structured_data["metadata"].update({
-                    "source_file": Path(file_path).name,
+                    "source_file": source_file,
                     "processing_duration_ms": int(processing_time),
                     "extraction_method": "mistral_structured",
                     "ocr_engine": "mistral_ocr_native",
@@ -496,63 +1287,50 @@ class MistralOCR:
                 logger.warning("No OCR text provided and no native OCR results available")
                 return {}
             
-            # Load schema file
-            with open(self.schema_path, 'r') as f:
-                schema = json.load(f)
+            if self._schema_description_json is None:
+                raise FileNotFoundError(f"Schema file not found: {self.schema_path}")
             
-            # Simplify schema description for prompt
-            schema_description = {}
-            for key, value in schema.get("properties", {}).items():
-                if not key.startswith("//") and not key == "metadata":
-                    schema_description[key] = value.get("description", "")
-            
-            # Create base64 encoded image for visual context (if needed)
-            with open(file_path, "rb") as img_file:
-                encoded = base64.b64encode(img_file.read()).decode()
+            # Start encoding the image for a possible vision pass, overlapping the text-only request
+            encoded_future = None
+            if self.enable_vision_fallback:
+                encoded_future = self._encode_pool.submit(self._b64_for, file_path)
             
             # First extract with text-only model for efficiency
-            prompt = (
-                "Extract structured data from this Spanish invoice OCR text according to this schema:\n\n"
-                f"{json.dumps(schema_description, indent=2)}\n\n"
-                "The OCR text of the invoice is:\n\n"
-                f"{ocr_text}\n\n"
-                "Return ONLY a valid JSON object with the extracted fields according to the schema. "
-                "For Spanish invoices, look for fields like: 'Factura', 'Número', 'Fecha', 'NIF/CIF', "
-                "'Emisor', 'Destinatario', 'Base Imponible', 'IVA', etc. For date fields, use DD/MM/YYYY format."
-            )
+            prompt = self._extract_prompt_prefix + ocr_text + self._extract_prompt_suffix
             
-            response = self._execute_with_retry(
-                self.client.chat.complete,
+            response_content = self._chat_content(
                 model="mistral-medium",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0
             )
             
             # Parse initial extraction
-            structured_data = json.loads(response.choices[0].message.content)
+            structured_data = jsonio.loads(response_content)
             confidence = 0.85  # Base confidence with text-only model
             
             # If text-only extraction misses critical fields, try with vision model
-            missing_fields = [field for field in schema.get("required", []) 
+            missing_fields = [field for field in self._required_fields
                              if field not in structured_data or not structured_data[field]]
+            critical_missing = [field for field in missing_fields if field in _CRITICAL_FIELDS]
             
-            if missing_fields:
+            if critical_missing and encoded_future is not None:
                 logger.info(f"Text-only extraction missing fields: {missing_fields}. Trying vision model.")
                 
+                # Base64 encoded image for visual context
+                encoded = encoded_future.result()
+                
                 # Vision model extraction (with both image and text)
                 vision_prompt = (
-                    "This is a Spanish invoice image. Extract ALL the structured data according to this schema:\n\n"
-                    f"{json.dumps(schema_description, indent=2)}\n\n"
-                    "For reference, this is the OCR text already extracted:\n\n"
+                    self._vision_prompt_prefix +
                     f"{ocr_text[:500]}...\n\n"
                     "Return ONLY a valid JSON object with the extracted fields. Pay special attention to "
                     f"these missing fields: {', '.join(missing_fields)}."
                 )
                 
-                vision_response = self._execute_with_retry(
-                    self.client.chat.complete,
+                vision_content = self._chat_content(
                     model="mistral-large-vision-latest",
                     messages=[
+                        {"role": "system", "content": "Return JSON only."},
                         {
                             "role": "user", 
                             "content": [
@@ -561,11 +1339,12 @@ class MistralOCR:
                             ]
                         }
                     ],
+                    response_format={"type": "json_object"},
                     temperature=0
                 )
                 
                 try:
-                    vision_data = json.loads(vision_response.choices[0].message.content)
+                    vision_data = jsonio.loads(vision_content)
                     
                     # Merge results, preferring vision model for previously missing fields
                     for field in missing_fields:
@@ -581,19 +1360,21 @@ class MistralOCR:
                     
                 except Exception as e:
                     logger.error(f"Error parsing vision model response: {str(e)}")
+            elif encoded_future is not None:
+                encoded_future.cancel()
             
             # Add metadata
             if "metadata" not in structured_data:
                 structured_data["metadata"] = {}
             
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             structured_data["metadata"].update({
                 "confidence_score": confidence,
                 "extraction_timestamp": datetime.now().isoformat(),
                 "ocr_engine": "mistral",
                 "ocr_engine_version": "latest",
-                "source_file": Path(file_path).name,
+                "source_file": source_file,
                 "processing_duration_ms": int(processing_time),
                 "extraction_method": "legacy"
             })
@@ -5,13 +5,27 @@ This module provides a fallback OCR option using Tesseract when Mistral OCR fail
 """
 
 import os
-import subprocess
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Union, Optional
+from typing import Dict, FrozenSet, List, Union, Optional
 
+import numpy as np
 import pytesseract
 from PIL import Image
 
+# Pages are OCRed on several threads, so Tesseract's own OpenMP threads would
+# oversubscribe the CPU. OpenMP reads this when libtesseract is loaded (and the
+# tesseract binary inherits it), so it is set before the import
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+try:
+    import tesserocr
+except ImportError:  # Optional, fall back to running the tesseract binary via pytesseract
+    tesserocr = None
+
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -34,6 +48,17 @@ class TesseractOCR:
         # Check if Tesseract is installed
         self._check_tesseract_installed()
         
+        # Installed language packs, listed once instead of on every OCR call
+        self._installed_langs = self._list_languages()
+        if not self._check_language_pack(self.lang):
+            logger.warning(f"Tesseract language pack '{self.lang}' not installed. Using default language.")
+        
+        # Pool of in-process Tesseract engines, reused for every image when tesserocr is installed
+        self.max_engines = max(1, config["ocr"]["tesseract"].get("max_engines", 4))
+        self._engines = queue.LifoQueue()
+        self._engine_count = 0
+        self._engine_lock = threading.Lock()
+        
         logger.info(f"Initialized Tesseract OCR with language: {self.lang}")
     
     def _check_tesseract_installed(self) -> None:
@@ -47,6 +72,23 @@ class TesseractOCR:
             logger.warning(f"Tesseract not properly configured: {str(e)}")
             logger.warning("Make sure Tesseract is installed and properly configured.")
     
+    def _list_languages(self) -> FrozenSet[str]:
+        """
+        List the installed Tesseract language packs.
+        
+        Returns:
+            Installed language codes (empty if they could not be listed)
+        """
+        try:
+            if tesserocr is not None:
+                # Read from the linked libtesseract, without starting the tesseract binary
+                _, languages = tesserocr.get_languages()
+                return frozenset(languages)
+            return frozenset(pytesseract.get_languages(config=""))
+        except Exception as e:
+            logger.warning(f"Could not list installed Tesseract language packs: {str(e)}")
+            return frozenset()
+    
     def _check_language_pack(self, lang: str) -> bool:
         """
         Check if the required language pack is installed.
@@ -57,18 +99,142 @@ class TesseractOCR:
         Returns:
             True if language pack is installed, False otherwise
         """
+        return lang in self._installed_langs
+    
+    def _create_api(self) -> "tesserocr.PyTessBaseAPI":
+        """
+        Create an in-process Tesseract engine configured like the CLI calls.
+        
+        Returns:
+            Tesseract API instance with the language data loaded
+        """
+        # Honour the engine mode of the configured options; the page mode is always a single block
+        oem_match = re.search(r"--oem\s+(\d)", self.options)
+        oem = int(oem_match.group(1)) if oem_match else tesserocr.OEM.DEFAULT
+        lang = self.lang if self._check_language_pack(self.lang) else "eng"
+        
+        return tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_BLOCK, oem=oem)
+    
+    def _acquire_api(self) -> "tesserocr.PyTessBaseAPI":
+        """
+        Take an idle Tesseract engine from the pool, creating one if fewer than max_engines exist.
+        
+        An engine is not thread-safe, but tesserocr releases the GIL while
+        recognizing, so engines on several threads let pages run in parallel.
+        Callers must hand the engine back with _release_api.
+        
+        Returns:
+            Tesseract API instance for the exclusive use of the caller
+        """
+        try:
+            return self._engines.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._engine_lock:
+            create = self._engine_count < self.max_engines
+            if create:
+                self._engine_count += 1
+        
+        if not create:
+            # Every engine exists and is busy; wait for one to be returned
+            return self._engines.get()
+        
+        try:
+            return self._create_api()
+        except Exception:
+            with self._engine_lock:
+                self._engine_count -= 1
+            raise
+    
+    def _release_api(self, api: "tesserocr.PyTessBaseAPI") -> None:
+        """
+        Return a Tesseract engine to the pool.
+        
+        Args:
+            api: Engine taken with _acquire_api
+        """
+        self._engines.put(api)
+    
+    def _recognize_words(self, image: Image.Image) -> List[Dict]:
+        """
+        Recognize the words of an image with the in-process Tesseract engine.
+        
+        Args:
+            image: Image to recognize
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        level = tesserocr.RIL.WORD
+        results = []
+        
+        api = self._acquire_api()
         try:
-            result = subprocess.run(
-                ["tesseract", "--list-langs"], 
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
-            installed_langs = result.stdout.strip().split("\n")[1:]  # Skip first line (header)
-            return lang in installed_langs
-        except subprocess.SubprocessError:
-            logger.warning(f"Could not check if language pack '{lang}' is installed")
-            return False
+            api.SetImage(image)
+            api.Recognize()
+            
+            for word in tesserocr.iterate_level(api.GetIterator(), level):
+                text = word.GetUTF8Text(level)
+                # Skip empty text
+                if not text or not text.strip():
+                    continue
+                
+                results.append({
+                    "text": text,
+                    "conf": word.Confidence(level) / 100.0,
+                    "box": word.BoundingBox(level),  # (left, top, right, bottom)
+                    "page": 0  # Tesseract processes one page at a time
+                })
+        finally:
+            self._release_api(api)
+        
+        return results
+    
+    def _image_to_data_words(self, image: Image.Image, lang: Optional[str]) -> List[Dict]:
+        """
+        Recognize the words of an image by running the tesseract binary.
+        
+        Args:
+            image: Image to recognize
+            lang: Language code (None for Tesseract's default)
+            
+        Returns:
+            List of dictionaries containing text and confidence scores
+        """
+        # Get detailed OCR results with confidence levels
+        config = f"{self.options} --psm 6"
+        data = pytesseract.image_to_data(
+            image, 
+            lang=lang,
+            config=config,
+            output_type=pytesseract.Output.DICT
+        )
+        
+        # Convert to standardized format, working on whole columns instead of word by word
+        texts = data["text"]
+        keep = np.flatnonzero(np.char.strip(np.array(texts, dtype=str)) != "")  # Skip empty text
+        
+        # Calculate confidence as probability (0-1)
+        confs = (np.asarray(data["conf"], dtype=np.float64)[keep] / 100.0).tolist()
+        
+        # Create box coordinates
+        left = np.asarray(data["left"])[keep]
+        top = np.asarray(data["top"])[keep]
+        right = left + np.asarray(data["width"])[keep]
+        bottom = top + np.asarray(data["height"])[keep]
+        
+        results = [
+            {
+                "text": texts[i],
+                "conf": conf,
+                "box": box,
+                "page": 0  # Tesseract processes one page at a time
+            }
+            for i, conf, box in zip(keep.tolist(), confs, zip(left.tolist(), top.tolist(), right.tolist(), bottom.tolist()))
+        ]
+        
+        return results
     
     def run_ocr(self, image_path: Union[str, Path]) -> List[Dict]:
         """
@@ -82,49 +248,17 @@ class TesseractOCR:
         """
         logger.debug(f"Running Tesseract OCR on: {image_path}")
         
-        # Ensure the language pack is installed
-        if not self._check_language_pack(self.lang):
-            logger.warning(f"Tesseract language pack '{self.lang}' not installed. Using default language.")
-            lang_param = None
-        else:
-            lang_param = self.lang
+        # Use the default language if the language pack is not installed
+        lang_param = self.lang if self._check_language_pack(self.lang) else None
         
         try:
             # Open the image
             image = Image.open(image_path)
             
-            # Get detailed OCR results with confidence levels
-            config = f"{self.options} --psm 6"
-            data = pytesseract.image_to_data(
-                image, 
-                lang=lang_param,
-                config=config,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Convert to standardized format
-            results = []
-            for i in range(len(data["text"])):
-                # Skip empty text
-                if not data["text"][i].strip():
-                    continue
-                    
-                # Calculate confidence as probability (0-1)
-                conf = float(data["conf"][i]) / 100.0
-                
-                # Create box coordinates
-                left = data["left"][i]
-                top = data["top"][i]
-                width = data["width"][i]
-                height = data["height"][i]
-                box = (left, top, left + width, top + height)
-                
-                results.append({
-                    "text": data["text"][i],
-                    "conf": conf,
-                    "box": box,
-                    "page": 0  # Tesseract processes one page at a time
-                })
+            if tesserocr is not None:
+                results = self._recognize_words(image)
+            else:
+                results = self._image_to_data_words(image, lang_param)
             
             num_words = len(results)
             avg_conf = sum(word["conf"] for word in results) / max(1, num_words)
@@ -136,6 +270,38 @@ class TesseractOCR:
             logger.error(f"Error running Tesseract OCR: {str(e)}")
             raise RuntimeError(f"Tesseract OCR failed: {str(e)}")
     
+    def run_ocr_batch(self, image_paths: List[Union[str, Path]], max_workers: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Run OCR on many images in parallel.
+        
+        Each worker checks an engine out of the pool, and Tesseract's
+        internal OpenMP threading is disabled so the workers do not
+        oversubscribe the CPU.
+        
+        Args:
+            image_paths: Paths to the image files
+            max_workers: Number of worker threads (defaults to the CPU count,
+                or to max_engines when tesserocr is installed)
+            
+        Returns:
+            OCR results of each image, in input order
+        """
+        if not image_paths:
+            return []
+        
+        default_workers = self.max_engines if tesserocr is not None else os.cpu_count() or 1
+        workers = min(len(image_paths), max_workers or default_workers)
+        logger.info(f"Running Tesseract OCR on {len(image_paths)} images with {workers} workers")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.run_ocr, image_paths))
+    
+    def __del__(self):
+        """Release the in-process Tesseract engines."""
+        engines = getattr(self, "_engines", None)
+        while engines is not None and not engines.empty():
+            engines.get_nowait().End()
+    
     def get_text_from_results(self, results: List[Dict]) -> str:
         """
         Extract plain text from OCR results.
@@ -74,13 +74,66 @@ class ConfigLoader:
         """
         # Process environment variables that start with INVOICE_CONFIG_
         prefix = "INVOICE_CONFIG_"
-        for key, value in os.environ.items():
-            if key.startswith(prefix):
-                # Remove prefix and split by underscore
-                config_path = key[len(prefix):].lower().split('_')
-                
-                # Update nested config value
-                self._update_nested_dict(self.config, config_path, value)
+        overrides = {key[len(prefix):].lower(): value for key, value in os.environ.items() if key.startswith(prefix)}
+        if not overrides:
+            return
+        
+        # Map every existing setting to its key path once, so names containing
+        # underscores (e.g. tesseract_fallback) resolve with a single lookup
+        key_paths = self._flatten_key_paths(self.config)
+        
+        for name, value in overrides.items():
+            path = key_paths.get(name)
+            if path is None:
+                # Unknown setting: split by underscore and create it
+                self._update_nested_dict(self.config, name.split('_'), value)
+                continue
+            
+            # Walk to the parent dict and set the value with the existing type
+            d = self.config
+            for key in path[:-1]:
+                d = d[key]
+            d[path[-1]] = self._convert_value(d[path[-1]], value)
+    
+    def _flatten_key_paths(self, d: Dict, parents: tuple = ()) -> Dict[str, tuple]:
+        """
+        Map the environment variable name of every leaf setting to its key path.
+        
+        Args:
+            d: Dictionary to flatten
+            parents: Key path of the dictionary within the configuration
+            
+        Returns:
+            Dictionary from lowercase names like 'ocr_preprocessing_dpi' to
+            key paths like ('ocr', 'preprocessing', 'dpi')
+        """
+        key_paths = {}
+        for key, value in d.items():
+            path = parents + (key,)
+            if isinstance(value, dict):
+                key_paths.update(self._flatten_key_paths(value, path))
+            else:
+                key_paths.setdefault("_".join(str(part) for part in path).lower(), path)
+        return key_paths
+    
+    def _convert_value(self, current: Any, value: str) -> Any:
+        """
+        Convert an environment variable value to the type of the current setting.
+        
+        Args:
+            current: Current value of the setting
+            value: Value from the environment
+            
+        Returns:
+            Converted value
+        """
+        if isinstance(current, bool):
+            return value.lower() in ('true', 'yes', '1', 'y')
+        elif isinstance(current, int):
+            return int(value)
+        elif isinstance(current, float):
+            return float(value)
+        return value
     
     def _update_nested_dict(self, d: Dict, path: list, value: Any) -> None:
         """
@@ -94,17 +147,7 @@ class ConfigLoader:
         key = path[0]
         if len(path) == 1:
             # Convert value to appropriate type based on existing value
-            if key in d:
-                if isinstance(d[key], bool):
-                    d[key] = value.lower() in ('true', 'yes', '1', 'y')
-                elif isinstance(d[key], int):
-                    d[key] = int(value)
-                elif isinstance(d[key], float):
-                    d[key] = float(value)
-                else:
-                    d[key] = value
-            else:
-                d[key] = value
+            d[key] = self._convert_value(d[key], value) if key in d else value
             return
             
         # Create nested dict if it doesn't exist
@@ -127,38 +170,76 @@ class ConfigLoader:
             "tesseract_fallback": True,
             "input": {
                 "allowed_formats": ["pdf", "jpg", "jpeg", "png", "tiff"],
-                "max_file_size_mb": 10
+                "max_file_size_mb": 10,
+                "skip_duplicates": False,
+                "duplicate_cache_dir": ".cache/documents"
             },
             "ocr": {
                 "preprocessing": {
                     "dpi": 300,
                     "deskew": True,
                     "denoise": True,
-                    "contrast_enhancement": True
+                    "denoise_method": "median",
+                    "contrast_enhancement": True,
+                    "contrast_method": "clahe",
+                    "use_opencl": True,
+                    "pdf_renderer": "pymupdf",
+                    "parallel_pages": 4
                 },
                 "mistral": {
                     "model": "mistral-ocr-base-spa",
                     "batch_size": 8,
-                    "greedy_decoding": True
+                    "greedy_decoding": True,
+                    "cache_enabled": True,
+                    "cache_dir": ".cache/ocr",
+                    "cache_max_bytes": 536870912,
+                    "batch_poll_interval": 30,
+                    "max_concurrency": 8,
+                    "adaptive_rate_limit": True,
+                    "max_request_interval": 10,
+                    "inline_max_bytes": 10485760,
+                    "max_connections": 64,
+                    "max_keepalive_connections": 32,
+                    "keepalive_expiry": 60,
+                    "http2": True,
+                    "base64_cache_size": 4,
+                    "enable_vision_fallback": True
                 },
                 "tesseract": {
                     "options": "--oem 1 --psm 6",
-                    "lang": "spa"
+                    "lang": "spa",
+                    "max_engines": 4
                 },
                 "confidence": {
                     "threshold": 0.85,
                     "merge_strategy": "highest_confidence"
-                }
+                },
+                "parallel_pages": 4
             },
             "openai": {
                 "model": "gpt-4o",
                 "temperature": 0,
                 "max_tokens": 2000,
+                "max_output_tokens": 16384,
                 "few_shot_examples": 3,
-                "log_prompts": True
+                "log_prompts": True,
+                "max_concurrency": 4,
+                "cache_enabled": True,
+                "cache_dir": ".cache/llm",
+                "batch_poll_interval": 30,
+                "batch_poll_retries": 5,
+                "batch_group_size": 1,
+                "max_connections": 64,
+                "max_keepalive_connections": 32,
+                "timeout": 60,
+                "max_requests_per_minute": 500,
+                "max_tokens_per_minute": 30000,
+                "skip_if_complete": True,
+                "skip_threshold": 0.9
             },
             "validation": {
                 "schema": "schemas/invoice.json",
+                "engine": "jsonschema",
                 "strict_mode": False
             },
             "export": {
@@ -167,7 +248,9 @@ class ConfigLoader:
                 "webhook": {
                     "enabled": False,
                     "url": "",
-                    "headers": {}
+                    "headers": {},
+                    "batch_size": 0,
+                    "max_concurrency": 4
                 }
             },
             "logging": {
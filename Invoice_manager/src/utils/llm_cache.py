@@ -0,0 +1,162 @@
+"""
+LLM Response Cache
+
+This module provides a content-addressed cache for LLM responses, so that
+identical prompts (re-runs, retries, duplicate scans) skip the API call.
+Entries are kept in a small in-memory LRU in front of a SQLite file.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+try:
+    import xxhash
+except ImportError:  # Optional accelerator, fall back to BLAKE2b
+    xxhash = None
+
+from src.utils import jsonio
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _hasher():
+    """Create a fast 128-bit hash object (keys only need collision resistance)."""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def make_key(**parts: Any) -> str:
+    """
+    Build a cache key from the parts that determine an LLM response.
+    
+    Args:
+        **parts: Model name, sampling parameters, messages, etc.
+    
+    Returns:
+        Hex digest of the canonical JSON encoding of the parts
+    """
+    digest = _hasher()
+    digest.update(jsonio.dumps_bytes(dict(sorted(parts.items()))))
+    return digest.hexdigest()
+
+
+def file_digest(file_path: Union[str, Path]) -> str:
+    """
+    Hash the contents of a file for use in a cache key.
+    
+    Args:
+        file_path: Path to the file
+    
+    Returns:
+        Hex digest of the file bytes
+    """
+    digest = _hasher()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SqliteCache:
+    """Persistent key/value cache for JSON-serializable LLM responses."""
+    
+    def __init__(self,
+                 cache_dir: Union[str, Path],
+                 memory_size: int = 256,
+                 name: str = "llm_cache",
+                 max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir: Directory holding the SQLite database
+            memory_size: Number of entries kept in the in-memory LRU
+            name: Database file name (without extension)
+            max_bytes: Maximum total size of stored values; the oldest
+                entries are evicted beyond it (None for no limit)
+        """
+        self.path = Path(cache_dir) / f"{name}.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+        
+        # Values are stored as JSON text so every hit returns a fresh copy
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        
+        logger.info(f"Initialized cache at: {self.path}")
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value = row[0]
+                self._remember(key, value)
+        
+        return jsonio.loads(value)
+    
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+        """
+        encoded = jsonio.dumps(value)
+        
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, encoded))
+            if self.max_bytes is not None:
+                self._evict()
+            self._conn.commit()
+            self._remember(key, encoded)
+    
+    def _evict(self) -> None:
+        """Delete the oldest entries until the stored values fit in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        # Rows are replaced on every write, so rowid order is write order
+        evicted = []
+        for rowid, key, size in self._conn.execute("SELECT rowid, key, LENGTH(value) FROM cache ORDER BY rowid"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid, key))
+            total -= size
+        
+        self._conn.executemany("DELETE FROM cache WHERE rowid = ?", [(rowid,) for rowid, _ in evicted])
+        for _, key in evicted:
+            self._memory.pop(key, None)
+        logger.debug(f"Evicted {len(evicted)} entries from cache: {self.path}")
+    
+    def _remember(self, key: str, value: str) -> None:
+        """Add an entry to the in-memory LRU, evicting the oldest if full."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
@@ -7,13 +7,46 @@ This module provides logging functionality for the invoice processor.
 import logging
 import os
 import sys
+import threading
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 # Global dictionary to cache loggers
 _loggers = {}
 
+# Handlers and formatters are shared by all loggers, so each log file is opened once
+_formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    '%Y-%m-%d %H:%M:%S'
+)
+_metrics_formatter = logging.Formatter(
+    '%(asctime)s - %(levelname)s - %(message)s',
+    '%Y-%m-%d %H:%M:%S'
+)
+_handlers: Dict[str, logging.Handler] = {}
+_handlers_lock = threading.Lock()
+
+
+class _KeywordFilter(logging.Filter):
+    """Passes only records whose message contains one of the keywords (case-insensitive)."""
+    
+    def __init__(self, *keywords: str):
+        """
+        Initialize the filter.
+        
+        Args:
+            *keywords: Lowercase keywords to look for
+        """
+        super().__init__()
+        self.keywords = keywords
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Messages are mostly pre-formatted f-strings, so only format when there are args
+        message = record.msg if isinstance(record.msg, str) and not record.args else record.getMessage()
+        message = message.lower()
+        return any(keyword in message for keyword in self.keywords)
+
 
 def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     """
@@ -46,29 +79,12 @@ def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     
     logger.setLevel(level)
     
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        '%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Create console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Create file handler
+    # Attach the shared console and file handlers
     log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    file_path = log_dir / "invoice_processor.log"
-    file_handler = RotatingFileHandler(
-        file_path,
-        maxBytes=10 * 1024 * 1024,  # 10 MB
-        backupCount=5
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    logger.addHandler(_shared_handler("console", _create_console_handler))
+    logger.addHandler(_shared_handler(
+        "file", lambda: _create_file_handler(log_dir / "invoice_processor.log", backup_count=5, formatter=_formatter)
+    ))
     
     # Add special handlers for specific loggers
     if name in ["src.ocr.confidence_merger", "src.ocr.mistral_wrapper", "src.ocr.tesseract_fallback"]:
@@ -82,6 +98,54 @@ def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     return logger
 
 
+def _shared_handler(key: str, factory: Callable[[], logging.Handler]) -> logging.Handler:
+    """
+    Get a shared handler, creating it on first use.
+    
+    Args:
+        key: Name of the handler
+        factory: Function creating the handler
+        
+    Returns:
+        Shared handler instance
+    """
+    with _handlers_lock:
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = _handlers[key] = factory()
+        return handler
+
+
+def _create_console_handler() -> logging.Handler:
+    """Create the console handler."""
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(_formatter)
+    return console_handler
+
+
+def _create_file_handler(file_path: Path, backup_count: int, formatter: logging.Formatter) -> logging.Handler:
+    """
+    Create a rotating file handler that opens its file on the first record.
+    
+    Args:
+        file_path: Path to the log file
+        backup_count: Number of rotated files to keep
+        formatter: Formatter for the records
+        
+    Returns:
+        File handler
+    """
+    file_path.parent.mkdir(exist_ok=True)
+    file_handler = RotatingFileHandler(
+        file_path,
+        maxBytes=10 * 1024 * 1024,  # 10 MB
+        backupCount=backup_count,
+        delay=True
+    )
+    file_handler.setFormatter(formatter)
+    return file_handler
+
+
 def _add_ocr_confidence_handler(logger: logging.Logger, log_dir: Path) -> None:
     """
     Add special handler for OCR confidence metrics.
@@ -90,25 +154,22 @@ def _add_ocr_confidence_handler(logger: logging.Logger, log_dir: Path) -> None:
         logger: Logger to add handler to
         log_dir: Directory for log files
     """
-    confidence_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        '%Y-%m-%d %H:%M:%S'
-    )
-    
-    confidence_handler = RotatingFileHandler(
-        log_dir / "ocr_confidence.log",
-        maxBytes=10 * 1024 * 1024,
-        backupCount=3
-    )
-    confidence_handler.setFormatter(confidence_formatter)
-    
-    # Only log messages containing "confidence" or "Confidence"
-    class ConfidenceFilter(logging.Filter):
-        def filter(self, record):
-            return "confidence" in record.getMessage() or "Confidence" in record.getMessage()
+    logger.addHandler(_shared_handler("ocr_confidence", lambda: _create_confidence_handler(log_dir)))
+
+
+def _create_confidence_handler(log_dir: Path) -> logging.Handler:
+    """
+    Create the handler for OCR confidence metrics.
     
-    confidence_handler.addFilter(ConfidenceFilter())
-    logger.addHandler(confidence_handler)
+    Args:
+        log_dir: Directory for log files
+        
+    Returns:
+        File handler writing confidence messages only
+    """
+    confidence_handler = _create_file_handler(log_dir / "ocr_confidence.log", backup_count=3, formatter=_metrics_formatter)
+    confidence_handler.addFilter(_KeywordFilter("confidence"))
+    return confidence_handler
 
 
 def _add_openai_latency_handler(logger: logging.Logger, log_dir: Path) -> None:
@@ -119,22 +180,19 @@ def _add_openai_latency_handler(logger: logging.Logger, log_dir: Path) -> None:
         logger: Logger to add handler to
         log_dir: Directory for log files
     """
-    latency_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        '%Y-%m-%d %H:%M:%S'
-    )
-    
-    latency_handler = RotatingFileHandler(
-        log_dir / "openai_latency.log",
-        maxBytes=10 * 1024 * 1024,
-        backupCount=3
-    )
-    latency_handler.setFormatter(latency_formatter)
-    
-    # Only log messages containing latency information
-    class LatencyFilter(logging.Filter):
-        def filter(self, record):
-            return "latency" in record.getMessage() or "time" in record.getMessage().lower()
+    logger.addHandler(_shared_handler("openai_latency", lambda: _create_latency_handler(log_dir)))
+
+
+def _create_latency_handler(log_dir: Path) -> logging.Handler:
+    """
+    Create the handler for OpenAI API latency metrics.
     
-    latency_handler.addFilter(LatencyFilter())
-    logger.addHandler(latency_handler) 
\ No newline at end of file
+    Args:
+        log_dir: Directory for log files
+        
+    Returns:
+        File handler writing latency messages only
+    """
+    latency_handler = _create_file_handler(log_dir / "openai_latency.log", backup_count=3, formatter=_metrics_formatter)
+    latency_handler.addFilter(_KeywordFilter("latency", "time"))
+    return latency_handler 
\ No newline at end of file
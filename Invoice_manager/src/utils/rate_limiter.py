@@ -0,0 +1,187 @@
+"""
+Rate Limiter
+
+This module provides client-side limiters for API requests. RateLimiter is a
+token bucket for OpenAI: requests wait locally until both the request and
+token budgets of the current minute allow them, instead of hitting 429 errors
+and backing off. AdaptiveLimiter paces Mistral requests without known limits
+by inferring them from 429 responses.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class RateLimiter:
+    """Token bucket for requests per minute and tokens per minute."""
+
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            max_requests_per_minute: Request budget per minute
+            max_tokens_per_minute: Token budget per minute (prompt plus completion)
+        """
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = float(max_requests_per_minute)
+        self.available_token_capacity = float(max_tokens_per_minute)
+
+        self._last_update = time.monotonic()
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Block until a request of the given size fits in the budget.
+
+        Args:
+            tokens: Estimated tokens used by the request
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        """
+        Wait without blocking the event loop until a request fits in the budget.
+
+        Args:
+            tokens: Estimated tokens used by the request
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def cooldown(self, seconds: Optional[float]) -> None:
+        """
+        Pause all requests, e.g. for the Retry-After period of a 429 response.
+
+        Args:
+            seconds: Pause length in seconds (defaults to 1 second)
+        """
+        seconds = seconds if seconds is not None else 1.0
+        logger.warning(f"Rate limit hit, pausing OpenAI requests for {seconds:.1f}s")
+
+        with self._lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Take capacity for a request if available.
+
+        Args:
+            tokens: Estimated tokens used by the request
+
+        Returns:
+            0 if the capacity was taken, otherwise seconds to wait before retrying
+        """
+        # A request larger than the whole budget only has to wait for a full bucket
+        tokens = min(tokens, self.max_tokens_per_minute)
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+
+            # Refill both buckets for the time elapsed since the last update
+            elapsed = now - self._last_update
+            self._last_update = now
+            self.available_request_capacity = min(
+                self.max_requests_per_minute,
+                self.available_request_capacity + elapsed * self.max_requests_per_minute / 60.0
+            )
+            self.available_token_capacity = min(
+                self.max_tokens_per_minute,
+                self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60.0
+            )
+
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return 0.0
+
+            # Time until both buckets have refilled enough
+            request_wait = (1 - self.available_request_capacity) * 60.0 / self.max_requests_per_minute
+            token_wait = (tokens - self.available_token_capacity) * 60.0 / self.max_tokens_per_minute
+            return max(request_wait, token_wait, 0.01)
+
+
+class AdaptiveLimiter:
+    """
+    Paces requests by adapting the gap between them to rate limiting (AIMD).
+
+    Every 429 response multiplies the gap between requests, and every
+    successful request shrinks it by a fixed step, so the request rate
+    settles just below what the server accepts without knowing its limits.
+    """
+
+    def __init__(self,
+                 max_interval: float = 10.0,
+                 initial_backoff: float = 0.1,
+                 increase_factor: float = 2.0,
+                 decrease_step: float = 0.05):
+        """
+        Initialize the adaptive limiter.
+
+        Args:
+            max_interval: Largest gap between requests in seconds
+            initial_backoff: Gap after the first 429 response in seconds
+            increase_factor: Factor applied to the gap on every 429 response
+            decrease_step: Seconds removed from the gap on every success
+        """
+        self.max_interval = max_interval
+        self.initial_backoff = initial_backoff
+        self.increase_factor = increase_factor
+        self.decrease_step = decrease_step
+        self.interval = 0.0
+
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until the next request slot."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """Wait without blocking the event loop until the next request slot."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Shrink the gap after a successful request (additive decrease)."""
+        with self._lock:
+            self.interval = max(0.0, self.interval - self.decrease_step)
+
+    def on_rate_limited(self) -> None:
+        """Widen the gap after a 429 response (multiplicative increase)."""
+        with self._lock:
+            self.interval = min(self.max_interval, max(self.initial_backoff, self.interval * self.increase_factor))
+            logger.debug(f"Rate limited, spacing requests {self.interval:.2f}s apart")
+
+    def _reserve(self) -> float:
+        """
+        Take the next request slot.
+
+        Returns:
+            Seconds to wait until the slot starts
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
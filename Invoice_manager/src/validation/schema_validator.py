@@ -4,17 +4,34 @@ Schema Validator
 This module validates extracted invoice data against the JSON schema.
 """
 
-import json
+import re
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import jsonschema
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
 
+from src.utils import jsonio
 from src.utils.logger import setup_logger
 
+try:
+    import fastjsonschema
+except ImportError:  # Optional accelerator, fall back to jsonschema
+    fastjsonschema = None
+
 logger = setup_logger(__name__)
 
+# Loaded and compiled schemas by file, modification time and engine, shared by all validators
+_compiled_schemas: Dict[Tuple[str, int, str], Tuple[Dict, Callable[[Dict], None]]] = {}
+_compiled_schemas_lock = threading.Lock()
+
+# Day, month and year separated by "/" or "-"
+_DATE_RE = re.compile(r"([^/-]*)[/-]([^/-]*)[/-]([^/-]*)")
+
+# Amount with a single decimal point, up to two decimals and no comma
+_DECIMAL_POINT_RE = re.compile(r"([^.,]*)\.([^.,]{0,2})")
+
 
 class SchemaValidator:
     """Validates extracted invoice data against a JSON schema."""
@@ -30,18 +47,31 @@ class SchemaValidator:
         self.strict_mode = config["validation"]["strict_mode"]
         self.schema_path = Path(config["validation"]["schema"])
         
-        # Load schema
-        with open(self.schema_path, 'r') as f:
-            self.schema = json.load(f)
+        # Validation engine: "jsonschema" interprets the schema and reports the best matching
+        # error; "fastjsonschema" generates specialized code but reports the first error it meets
+        self.engine = config["validation"].get("engine", "jsonschema")
+        if self.engine == "fastjsonschema" and fastjsonschema is None:
+            logger.debug("fastjsonschema not installed, validating with jsonschema")
+            self.engine = "jsonschema"
+        
+        # Load and compile the schema once per process; every validate() call reuses it
+        self.schema, self._validate_schema = self._load_schema(self.schema_path)
+        
+        # Schema parts looked up for every invoice
+        self._required = tuple(self.schema.get("required", ()))
+        self._required_set = frozenset(self._required)
+        self._properties = self.schema.get("properties", {})
+        self._formatters = self._build_formatters()
         
         logger.info(f"Initialized schema validator with schema: {self.schema_path}")
     
-    def validate(self, data: Dict) -> Dict:
+    def validate(self, data: Dict, mutate: bool = False) -> Dict:
         """
         Validate invoice data against the schema.
         
         Args:
             data: Invoice data to validate
+            mutate: Correct and annotate data in place instead of a shallow copy
             
         Returns:
             Validated data with any corrections or errors added to metadata
@@ -49,7 +79,7 @@ class SchemaValidator:
         logger.info("Validating extracted invoice data against schema")
         
         # Copy data to avoid modifying original
-        validated_data = data.copy()
+        validated_data = data if mutate else data.copy()
         
         # Create or access metadata
         if "metadata" not in validated_data:
@@ -67,12 +97,12 @@ class SchemaValidator:
         
         # Perform schema validation
         try:
-            # Remove metadata before validation (will add back later)
-            temp_data = validated_data.copy()
-            metadata = temp_data.pop("metadata", {})
-            
-            # Validate against schema
-            validate(instance=temp_data, schema=self.schema)
+            # Remove metadata during validation instead of copying the data
+            metadata = validated_data.pop("metadata")
+            try:
+                self._validate_schema(validated_data)
+            finally:
+                validated_data["metadata"] = metadata
             validated_data["metadata"]["validation_passed"] = True
             
             logger.info("Schema validation passed")
@@ -96,6 +126,64 @@ class SchemaValidator:
         
         return validated_data
     
+    def _load_schema(self, schema_path: Path) -> Tuple[Dict, Callable[[Dict], None]]:
+        """
+        Load and compile a schema file, reusing an earlier compilation of the same file.
+        
+        Args:
+            schema_path: Path to the JSON schema file
+            
+        Returns:
+            Tuple of (schema, validation function)
+        """
+        key = (str(schema_path.resolve()), schema_path.stat().st_mtime_ns, self.engine)
+        
+        with _compiled_schemas_lock:
+            cached = _compiled_schemas.get(key)
+            if cached is None:
+                schema = jsonio.loads(schema_path.read_bytes())
+                cached = _compiled_schemas[key] = (schema, self._compile_schema(schema))
+        
+        return cached
+    
+    def _compile_schema(self, schema: Dict) -> Callable[[Dict], None]:
+        """
+        Compile the JSON schema into a reusable validation function.
+        
+        With the fastjsonschema engine, Python code specialized to the schema
+        is generated. With the jsonschema engine, a validator is built once
+        and reused. Either way, failures raise jsonschema's ValidationError.
+        
+        Args:
+            schema: JSON schema for invoice data
+            
+        Returns:
+            Function that validates an instance and raises ValidationError
+        """
+        if self.engine == "fastjsonschema":
+            # Match jsonschema.validate: no default filling, no format checks
+            compiled = fastjsonschema.compile(schema, use_default=False, use_formats=False)
+            
+            def validate_fast(instance: Dict) -> None:
+                try:
+                    compiled(instance)
+                except fastjsonschema.JsonSchemaValueException as e:
+                    # Drop the leading "data" element of the fastjsonschema path
+                    raise ValidationError(e.message, path=e.path[1:])
+            
+            return validate_fast
+        
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        validator = validator_class(schema)
+        
+        def validate_compiled(instance: Dict) -> None:
+            error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+            if error is not None:
+                raise error
+        
+        return validate_compiled
+    
     def _check_required_fields(self, data: Dict) -> None:
         """
         Check that all required fields are present.
@@ -103,10 +191,11 @@ class SchemaValidator:
         Args:
             data: Invoice data to check
         """
-        if "required" not in self.schema:
+        # Usually every required field is present, which one set operation confirms
+        if self._required_set.issubset(data):
             return
-            
-        for field in self.schema["required"]:
+        
+        for field in self._required:
             if field not in data:
                 error = f"Required field '{field}' is missing"
                 logger.warning(error)
@@ -119,29 +208,41 @@ class SchemaValidator:
                 # Add placeholder for missing required field
                 data[field] = self._get_default_value(field)
     
-    def _format_fields(self, data: Dict) -> None:
+    def _build_formatters(self) -> Dict[str, Callable[[str], str]]:
         """
-        Format fields according to schema patterns.
+        Choose the formatter for each schema property once.
         
-        Args:
-            data: Invoice data to format
+        Returns:
+            Dictionary from field name to formatting function
         """
-        properties = self.schema.get("properties", {})
-        
-        for field, value in data.items():
-            # Skip metadata and non-string fields
-            if field == "metadata" or not isinstance(value, str) or field not in properties:
+        formatters = {}
+        for field, field_schema in self._properties.items():
+            if field == "metadata":
                 continue
-                
-            # Get field schema
-            field_schema = properties[field]
             
             # Apply formatting based on field type and pattern
             if field == "issue_date" and "pattern" in field_schema:
-                data[field] = self._format_date(value)
+                formatters[field] = self._format_date
             
             elif "total" in field.lower() or field == "vat_amount" or "price" in field.lower():
-                data[field] = self._format_currency(value)
+                formatters[field] = self._format_currency
+        
+        return formatters
+    
+    def _format_fields(self, data: Dict) -> None:
+        """
+        Format fields according to schema patterns.
+        
+        Args:
+            data: Invoice data to format
+        """
+        formatters = self._formatters
+        
+        for field, value in data.items():
+            # Skip fields without a formatter and non-string values
+            formatter = formatters.get(field)
+            if formatter is not None and isinstance(value, str):
+                data[field] = formatter(value)
     
     def _format_date(self, date_str: str) -> str:
         """
@@ -153,32 +254,25 @@ class SchemaValidator:
         Returns:
             Formatted date string
         """
-        # Clean up date string
+        # Clean up date string and split it into day, month and year in one pass
         date_str = date_str.strip()
+        match = _DATE_RE.fullmatch(date_str)
+        if match is None:
+            return date_str.replace("-", "/")
         
-        # Replace hyphens with slashes
-        date_str = date_str.replace("-", "/")
+        day, month, year = match.groups()
         
         # Ensure 2-digit day and month
-        parts = date_str.split("/")
-        if len(parts) == 3:
-            day, month, year = parts
-            
-            # Ensure 2-digit day
-            if len(day) == 1:
-                day = f"0{day}"
-                
-            # Ensure 2-digit month
-            if len(month) == 1:
-                month = f"0{month}"
-                
-            # Convert 2-digit year to 4-digit if needed
-            if len(year) == 2:
-                year = f"20{year}"
-                
-            date_str = f"{day}/{month}/{year}"
+        if len(day) == 1:
+            day = f"0{day}"
+        if len(month) == 1:
+            month = f"0{month}"
+        
+        # Convert 2-digit year to 4-digit if needed
+        if len(year) == 2:
+            year = f"20{year}"
         
-        return date_str
+        return f"{day}/{month}/{year}"
     
     def _format_currency(self, currency_str: str) -> str:
         """
@@ -194,10 +288,9 @@ class SchemaValidator:
         currency_str = currency_str.strip()
         
         # Ensure decimal comma
-        if "." in currency_str and "," not in currency_str:
-            parts = currency_str.split(".")
-            if len(parts) == 2 and len(parts[1]) <= 2:
-                currency_str = currency_str.replace(".", ",")
+        match = _DECIMAL_POINT_RE.fullmatch(currency_str)
+        if match is not None:
+            currency_str = f"{match[1]},{match[2]}"
         
         # Add € symbol if not present
         if "€" not in currency_str and "EUR" not in currency_str:
@@ -215,7 +308,7 @@ class SchemaValidator:
         Returns:
             Default value for the field
         """
-        field_schema = self.schema.get("properties", {}).get(field, {})
+        field_schema = self._properties.get(field, {})
         field_type = field_schema.get("type", "string")
         
         if field_type == "string":
@@ -0,0 +1,121 @@
+"""
+Test export writer functionality.
+"""
+
+import csv
+import json
+
+import pytest
+
+from src.export.writers import CSVWriter, JSONWriter, WebhookWriter
+
+
+@pytest.fixture
+def sample_invoice():
+    """Create a sample invoice record."""
+    return {
+        "invoice_number": "F2023-1234",
+        "issue_date": "15/06/2023",
+        "total_eur": "2090,28 €",
+        "line_items": [
+            {"description": "Servicio de consultoría", "qty": "10", "unit_price": "100,00", "line_total": "1000,00"}
+        ],
+        "metadata": {"extraction_method": "regex_heuristics"}
+    }
+
+
+def test_csv_writer_single_invoice(tmp_path, sample_invoice):
+    """Test that a single invoice is written as a header and one row."""
+    output_path = CSVWriter().write(sample_invoice, str(tmp_path / "out.csv"))
+
+    with open(output_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+
+    assert rows[0] == [
+        "invoice_number", "issue_date", "total_eur",
+        "line_item_1_description", "line_item_1_qty", "line_item_1_unit_price", "line_item_1_line_total"
+    ]
+    assert rows[1] == ["F2023-1234", "15/06/2023", "2090,28 €", "Servicio de consultoría", "10", "100,00", "1000,00"]
+
+
+def test_csv_writer_missing_fields(tmp_path, sample_invoice):
+    """Test that fields missing from later invoices are left empty."""
+    second = {"invoice_number": "F2023-1235"}
+    output_path = CSVWriter().write([sample_invoice, second], str(tmp_path / "out.csv"))
+
+    with open(output_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    assert len(rows) == 2
+    assert rows[1]["invoice_number"] == "F2023-1235"
+    assert rows[1]["issue_date"] == ""
+    assert rows[1]["line_item_1_description"] == ""
+
+
+def test_json_writer_round_trip(tmp_path, sample_invoice):
+    """Test that JSON output preserves non-ASCII text and structure."""
+    output_path = JSONWriter().write(sample_invoice, str(tmp_path / "out.json"))
+
+    with open(output_path, encoding="utf-8") as f:
+        content = f.read()
+
+    assert "consultoría" in content
+    assert json.loads(content) == sample_invoice
+
+
+def test_webhook_writer_reuses_session(monkeypatch, sample_invoice):
+    """Test that webhook requests go through the writer's pooled session."""
+    config = {"export": {"webhook": {"enabled": True, "url": "https://example.com/hook", "headers": {"X-Token": "abc"}}}}
+    writer = WebhookWriter(config)
+    calls = []
+
+    class FakeResponse:
+        ok = True
+        status_code = 200
+
+    def fake_post(url, **kwargs):
+        calls.append((url, kwargs))
+        return FakeResponse()
+
+    monkeypatch.setattr(writer._session, "post", fake_post)
+
+    assert writer.write(sample_invoice) == "Webhook request successful: 200"
+    assert writer.write(sample_invoice) == "Webhook request successful: 200"
+    assert len(calls) == 2
+    assert calls[0][1]["timeout"] == writer.timeout
+    assert writer._session.headers["X-Token"] == "abc"
+
+
+def test_webhook_writer_batches(monkeypatch, sample_invoice):
+    """Test that long invoice lists are split into batches."""
+    config = {"export": {"webhook": {"enabled": True, "url": "https://example.com/hook", "headers": {}, "batch_size": 2}}}
+    writer = WebhookWriter(config)
+    payloads = []
+
+    class FakeResponse:
+        ok = True
+        status_code = 200
+
+    def fake_post(url, json=None, **kwargs):
+        payloads.append(json)
+        return FakeResponse()
+
+    monkeypatch.setattr(writer._session, "post", fake_post)
+
+    assert writer.write([sample_invoice] * 5) == "Webhook requests successful: 3 batches"
+    assert sorted(len(p) for p in payloads) == [1, 2, 2]
+
+
+def test_csv_writer_line_items_from_whole_batch(tmp_path, sample_invoice):
+    """Test that line item columns cover the invoice with the most items."""
+    second = dict(sample_invoice, invoice_number="F2023-1235")
+    second["line_items"] = sample_invoice["line_items"] * 2
+    writer = CSVWriter()
+    output_path = writer.write([sample_invoice, second], str(tmp_path / "out.csv"))
+
+    with open(output_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    assert rows[0]["line_item_2_description"] == ""
+    assert rows[1]["line_item_2_description"] == "Servicio de consultoría"
+    assert writer._get_flattened_fields([sample_invoice, second]) is writer._get_flattened_fields([second, sample_invoice])
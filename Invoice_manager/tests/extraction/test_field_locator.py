@@ -4,11 +4,12 @@ Test field locator functionality.
 
 import json
 import os
+import re
 from pathlib import Path
 
 import pytest
 
-from src.extraction.field_locator import FieldLocator
+from src.extraction.field_locator import FieldLocator, parse_amount
 from src.utils.cfg import ConfigLoader
 
 
@@ -81,8 +82,8 @@ def test_extract_with_patterns(field_locator):
     """Test pattern-based extraction."""
     text = "Factura Nº: ABC123"
     patterns = [
-        r"(?:factura|fact|fra)(?:\s+)(?:n[º|°|o]?\.?:?\s*)([A-Za-z0-9\-\/]+)",
-        r"(?:invoice number|invoice no):?\s*([A-Za-z0-9\-\/]+)"
+        re.compile(r"(?:factura|fact|fra)(?:\s+)(?:n[º|°|o]?\.?:?\s*)([A-Za-z0-9\-\/]+)", re.IGNORECASE),
+        re.compile(r"(?:invoice number|invoice no):?\s*([A-Za-z0-9\-\/]+)", re.IGNORECASE)
     ]
     
     result = field_locator._extract_with_patterns(text, patterns)
@@ -108,4 +109,22 @@ def test_extract_line_items(field_locator, sample_invoice_text):
     assert "description" in first_item
     assert "qty" in first_item
     assert "unit_price" in first_item
-    assert "line_total" in first_item 
\ No newline at end of file
+    assert "line_total" in first_item 
+
+
+def test_parse_amount():
+    """Test that Spanish formatted amounts are converted to floats."""
+    assert parse_amount("2.090,28") == 2090.28
+    assert parse_amount("2 090,28 €") == 2090.28
+    assert parse_amount("363\xa0,00") == 363.0
+    assert parse_amount("N/A") is None
+
+
+def test_extract_fields_cache(field_locator, sample_invoice_text):
+    """Test that repeated extraction of the same text returns independent copies."""
+    first = field_locator.extract_fields(sample_invoice_text)
+    first["invoice_number"] = "changed"
+    second = field_locator.extract_fields(sample_invoice_text)
+
+    assert second["invoice_number"] != "changed"
+    assert second is not first
@@ -0,0 +1,3 @@
+"""
+Tests for the preprocessing package.
+"""
\ No newline at end of file
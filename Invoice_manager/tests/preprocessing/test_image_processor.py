@@ -0,0 +1,52 @@
+"""
+Test image processor functionality.
+"""
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("pdf2image")
+
+from src.preprocessing.image_processor import ImageProcessor
+from src.utils.cfg import ConfigLoader
+
+
+def make_page(angle: float) -> np.ndarray:
+    """Render an A4 page of text lines at 300 DPI, rotated by the given angle."""
+    height, width = 3508, 2480
+    page = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(300, height - 300, 70):
+        cv2.putText(page, "Factura 2023-1234 Servicio de consultoria 1000,00 EUR", (250, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.6, 0, 3)
+    
+    rotation_matrix = cv2.getRotationMatrix2D((width // 2, height // 2), angle, 1.0)
+    return cv2.warpAffine(page, rotation_matrix, (width, height), flags=cv2.INTER_CUBIC, borderValue=255)
+
+
+@pytest.fixture
+def processor():
+    """Create an image processor with the default configuration."""
+    return ImageProcessor(ConfigLoader()._get_default_config())
+
+
+@pytest.mark.parametrize("angle", [0.5, 1.0, 1.5, 2.0, -1.5, 2.5])
+def test_detect_skew_angle(processor, angle):
+    """Test that common scanner skews are detected to within a fifth of a degree."""
+    skew_angle = processor._detect_skew_angle(make_page(angle))
+    
+    # A counter-clockwise rotation shows up as a negative skew, which deskewing undoes
+    assert skew_angle == pytest.approx(-angle, abs=0.2)
+
+
+@pytest.mark.filterwarnings("error")
+def test_detect_skew_angle_vertical_rules(processor):
+    """Test that a page dominated by near-vertical rules is not refined or corrected."""
+    page = np.full((3508, 2480), 255, dtype=np.uint8)
+    for x in range(300, 2200, 150):
+        cv2.line(page, (x, 200), (x + 25, 3300), 0, 3)
+    
+    skew_angle = processor._detect_skew_angle(page)
+    
+    assert abs(skew_angle) >= 10
+    assert processor._deskew_image(page, page.shape) is page
@@ -92,4 +92,20 @@ def test_get_method():
     assert config_loader.get("non_existent", "default") == "default"
     
     # Test getting a nested non-existent value with default
-    assert config_loader.get("ocr.non_existent", 123) == 123 
\ No newline at end of file
+    assert config_loader.get("ocr.non_existent", 123) == 123 
+
+
+def test_env_var_override_key_with_underscores():
+    """Test that environment variables reach settings whose names contain underscores."""
+    os.environ["INVOICE_CONFIG_TESSERACT_FALLBACK"] = "false"
+    os.environ["INVOICE_CONFIG_OCR_MISTRAL_MAX_CONCURRENCY"] = "4"
+    
+    try:
+        config_loader = ConfigLoader()
+        
+        assert config_loader.config["tesseract_fallback"] is False
+        assert config_loader.config["ocr"]["mistral"]["max_concurrency"] == 4
+        
+    finally:
+        del os.environ["INVOICE_CONFIG_TESSERACT_FALLBACK"]
+        del os.environ["INVOICE_CONFIG_OCR_MISTRAL_MAX_CONCURRENCY"]
@@ -0,0 +1,49 @@
+"""
+Test LLM response cache functionality.
+"""
+
+from src.utils.llm_cache import SqliteCache, file_digest, make_key
+
+
+def test_make_key_is_order_independent():
+    """Test that keys depend on the parts, not on argument order."""
+    messages = [{"role": "user", "content": "Factura Nº: F2023-1234"}]
+
+    assert make_key(model="gpt-4o", messages=messages) == make_key(messages=messages, model="gpt-4o")
+    assert make_key(model="gpt-4o", messages=messages) != make_key(model="gpt-4o-mini", messages=messages)
+
+
+def test_file_digest_tracks_contents(tmp_path):
+    """Test that file digests depend only on the file contents."""
+    first = tmp_path / "a.pdf"
+    second = tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 invoice")
+    second.write_bytes(b"%PDF-1.4 invoice")
+
+    assert file_digest(first) == file_digest(second)
+    second.write_bytes(b"%PDF-1.4 other invoice")
+    assert file_digest(first) != file_digest(second)
+
+
+def test_cache_persists_and_returns_copies(tmp_path):
+    """Test that values survive a new cache instance and hits are independent copies."""
+    cache = SqliteCache(tmp_path)
+    cache.set("key", {"invoice_number": "F2023-1234"})
+
+    hit = cache.get("key")
+    hit["invoice_number"] = "changed"
+
+    assert cache.get("key") == {"invoice_number": "F2023-1234"}
+    assert SqliteCache(tmp_path, memory_size=0).get("key") == {"invoice_number": "F2023-1234"}
+    assert cache.get("missing") is None
+
+
+def test_cache_evicts_oldest_beyond_max_bytes(tmp_path):
+    """Test that the oldest entries are dropped once values exceed max_bytes."""
+    cache = SqliteCache(tmp_path, max_bytes=50)
+    for i in range(5):
+        cache.set(f"key{i}", "x" * 20)
+
+    assert cache.get("key0") is None
+    assert cache.get("key4") == "x" * 20
+    assert SqliteCache(tmp_path, memory_size=0).get("key3") == "x" * 20
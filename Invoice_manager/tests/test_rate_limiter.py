@@ -0,0 +1,50 @@
+"""
+Test rate limiter functionality.
+"""
+
+from src.utils.rate_limiter import AdaptiveLimiter, RateLimiter
+
+
+def test_rate_limiter_budgets():
+    """Test that requests are admitted until either budget runs out."""
+    limiter = RateLimiter(max_requests_per_minute=2, max_tokens_per_minute=1000)
+
+    assert limiter._reserve(400) == 0
+    assert limiter._reserve(400) == 0
+    # Out of requests: one request refills in 30 seconds
+    assert 29 < limiter._reserve(10) <= 30
+
+    limiter = RateLimiter(max_requests_per_minute=100, max_tokens_per_minute=1000)
+    assert limiter._reserve(900) == 0
+    # Out of tokens: 400 more tokens take about 24 seconds
+    assert 23 < limiter._reserve(500) <= 24
+
+
+def test_rate_limiter_cooldown():
+    """Test that a cooldown holds back requests even with capacity left."""
+    limiter = RateLimiter(max_requests_per_minute=100, max_tokens_per_minute=1000)
+    limiter.cooldown(5)
+
+    assert 4 < limiter._reserve(10) <= 5
+    assert limiter.available_request_capacity == 100
+
+
+def test_adaptive_limiter_aimd():
+    """Test that 429s widen the request gap and successes narrow it again."""
+    limiter = AdaptiveLimiter(max_interval=1.0, initial_backoff=0.1, increase_factor=2.0, decrease_step=0.05)
+    assert limiter._reserve() == 0
+
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.interval == 0.2
+    for _ in range(10):
+        limiter.on_rate_limited()
+    assert limiter.interval == 1.0
+
+    limiter.on_success()
+    assert limiter.interval == 0.95
+
+    # Back-to-back requests are spaced one interval apart
+    limiter._next_slot = 0.0
+    limiter._reserve()
+    assert 0.9 < limiter._reserve() <= 0.95
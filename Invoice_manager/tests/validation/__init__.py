@@ -0,0 +1,3 @@
+"""
+Tests for the validation package.
+"""
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Test schema validator functionality.
+"""
+
+import pytest
+
+from src.utils.cfg import ConfigLoader
+from src.validation.schema_validator import SchemaValidator
+
+
+@pytest.fixture
+def invoice():
+    """Create an invoice with an invalid vendor tax ID and total."""
+    return {
+        "invoice_number": "F2023-1234",
+        "issue_date": "15/06/2023",
+        "total_eur": "2090.28 EUR",
+        "vat_rate": "21%",
+        "vat_amount": "362,78 €",
+        "vendor_name": "Consultoría Ejemplo S.L.",
+        "vendor_tax_id": "B1",
+        "buyer_name": "Cliente Ejemplo S.A."
+    }
+
+
+def make_validator(engine):
+    """Create a non-strict validator using the given engine."""
+    config = ConfigLoader()._get_default_config()
+    config["validation"]["strict_mode"] = False
+    config["validation"]["engine"] = engine
+    return SchemaValidator(config)
+
+
+def test_default_engine_is_jsonschema():
+    """Test that jsonschema is the default validation engine."""
+    config = ConfigLoader()._get_default_config()
+    del config["validation"]["engine"]
+    
+    assert SchemaValidator(config).engine == "jsonschema"
+
+
+def test_jsonschema_engine_errors(invoice):
+    """Test that the jsonschema engine records jsonschema's best matching error."""
+    result = make_validator("jsonschema").validate(invoice)
+    
+    assert result["metadata"]["validation_passed"] is False
+    assert result["metadata"]["validation_errors"] == [{
+        "path": "vendor_tax_id",
+        "message": "'B1' does not match '^[A-Z0-9]\\\\d{7}[A-Z0-9]$'"
+    }]
+
+
+def test_fastjsonschema_engine_errors(invoice):
+    """Test that the fastjsonschema engine records the first error with its own message."""
+    pytest.importorskip("fastjsonschema")
+    
+    result = make_validator("fastjsonschema").validate(invoice)
+    
+    assert result["metadata"]["validation_passed"] is False
+    assert result["metadata"]["validation_errors"] == [{
+        "path": "total_eur",
+        "message": "data.total_eur must match pattern ^[0-9]{1,3}(\\s?[0-9]{3})*(,[0-9]{2})?(\\s?€)?$"
+    }]
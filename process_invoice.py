@@ -11,6 +11,7 @@ import os
 import sys
 import argparse
 import json
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
@@ -33,6 +34,19 @@ except ImportError as e:
     print("pip install -r temp_requirements.txt")
     sys.exit(1)
 
+@lru_cache(maxsize=None)
+def get_processor(config_path=None):
+    """
+    Get the invoice processor for a config file, creating it on first use.
+    
+    The processor loads the schema, OCR clients and caches once, so it is
+    shared by every invoice processed with the same config.
+    
+    Args:
+        config_path: Path to custom config file
+    """
+    return InvoiceProcessor(config_path)
+
 def process_single_invoice(invoice_path, output_path=None, format="json", config_path=None, 
                            use_mistral_structured=True, direct_pdf_processing=True):
     """
@@ -47,8 +61,8 @@ def process_single_invoice(invoice_path, output_path=None, format="json", config
         direct_pdf_processing: Whether to use direct PDF processing for PDF files
     """
     try:
-        # Initialize processor
-        processor = InvoiceProcessor(config_path)
+        # Get the shared processor for this config
+        processor = get_processor(config_path)
         
         # Process invoice
         print(f"Processing invoice: {invoice_path}")
@@ -154,8 +168,8 @@ def batch_process_invoices(directory_path, output_dir=None, format="json", confi
         direct_pdf_processing: Whether to use direct PDF processing for PDF files
     """
     try:
-        # Initialize processor
-        processor = InvoiceProcessor(config_path)
+        # Get the shared processor for this config
+        processor = get_processor(config_path)
         
         # Create default output directory if needed
         if not output_dir: